@@ -8,3 +8,7 @@ class AttributeNotExist(Exception):
 
 class InvalidConditionGiven(Exception):
     pass
+
+
+class NotSupportedDialect(Exception):
+    pass
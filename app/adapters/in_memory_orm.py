@@ -1,14 +1,15 @@
-from collections import deque
-
 from sqlalchemy import MetaData, event
 from sqlalchemy.orm import registry
 
+from app.adapters.outbox import outbox_table
 from app.domain import models
 
 metadata = MetaData()
 
 mapper_registry = registry(metadata=metadata)
 
+outbox = outbox_table(metadata)
+
 
 def start_mappers():
     pass
@@ -16,4 +17,4 @@ def start_mappers():
 
 @event.listens_for(models.ExampleModel, "load")
 def receive_load_review(example_model, _):
-    example_model.events = deque()
+    example_model.events = models.EventBuffer()
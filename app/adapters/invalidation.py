@@ -0,0 +1,269 @@
+import abc
+import asyncio
+import glob
+import json
+import logging
+import os
+import socket
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from inspect import isawaitable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import config
+from app.common.codec import decode_value, encode_value
+
+logger = logging.getLogger(__name__)
+
+# session.info key under which the primary keys written in the current transaction are collected, per model.
+CHANGED_KEYS = "invalidation_changed_keys"
+
+
+@dataclass(frozen=True)
+class ModelChanges:
+    model: str
+    tables: tuple[str, ...]
+    # Primary key identities (tuples) of the rows written; None means "any row", used when there are too many to list.
+    keys: frozenset | None
+
+
+def encode_changes(changes: list[ModelChanges]) -> bytes:
+    # JSON rather than pickle: anything able to write to the socket directory could otherwise run code in every worker.
+    return json.dumps(
+        [
+            {
+                "model": change.model,
+                "tables": change.tables,
+                "keys": None if change.keys is None else [[encode_value(v) for v in key] for key in change.keys],
+            }
+            for change in changes
+        ],
+        separators=(",", ":"),
+    ).encode()
+
+
+def decode_changes(payload: bytes) -> list[ModelChanges]:
+    return [
+        ModelChanges(
+            model=change["model"],
+            tables=tuple(change["tables"]),
+            keys=None if change["keys"] is None else frozenset(tuple(map(decode_value, key)) for key in change["keys"]),
+        )
+        for change in json.loads(payload)
+    ]
+
+
+def mark_changed_keys(session: Session, model: type, keys: Iterable[tuple]):
+    session.info.setdefault(CHANGED_KEYS, {}).setdefault(model, set()).update(keys)
+
+
+def pop_changed_keys(session: Session) -> list[ModelChanges]:
+    changed: dict[type, set] = session.info.pop(CHANGED_KEYS, {})
+    return [
+        ModelChanges(
+            model=model.__name__,
+            tables=tuple(table.name for table in inspect(model).tables),
+            keys=frozenset(keys),
+        )
+        for model, keys in changed.items()
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_keys(session: Session, _):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        mapper = inspect(type(obj))
+        mark_changed_keys(session, mapper.class_, [tuple(mapper.primary_key_from_instance(obj))])
+
+
+Subscriber = Callable[[list[ModelChanges]], object]
+
+
+class AbstractInvalidationTransport(abc.ABC):
+    """
+    Carries published changes to the other processes; delivery to subscribers of this process is done by the bus.
+    """
+
+    async def start(self, receive: Callable[[list[ModelChanges]], None]):
+        pass
+
+    @abc.abstractmethod
+    def send(self, changes: list[ModelChanges]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InProcessTransport(AbstractInvalidationTransport):
+    def send(self, changes: list[ModelChanges]):
+        pass
+
+
+class UnixDatagramTransport(AbstractInvalidationTransport):
+    """
+    Local pub/sub between the worker processes of one host: every process binds a datagram socket in `directory`
+    and sends each change set to all the other sockets found there. Sockets nobody listens on any more are removed.
+    Datagrams are fire-and-forget, so a process that misses one falls back on the TTL of its caches.
+    """
+
+    # Change sets that don't fit are sent per model, and models whose keys still don't fit as "any row" instead.
+    max_datagram_size = 64 * 1024
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Both set in `start`, in the process that runs the loop: a transport built at import time by a parent
+        # that forks its workers afterwards must not hand them all the parent's socket path.
+        self.path: str | None = None
+        self._send_socket: socket.socket | None = None
+        self._transport: asyncio.DatagramTransport | None = None
+
+    async def start(self, receive: Callable[[list[ModelChanges]], None]):
+        self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        self._send_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_socket.setblocking(False)
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramReceiver(receive), sock=sock
+        )
+
+    def send(self, changes: list[ModelChanges]):
+        if self._send_socket is None:
+            return
+        for payload in self._payloads(changes):
+            for peer in glob.glob(os.path.join(self.directory, "*.sock")):
+                if peer == self.path:
+                    continue
+                try:
+                    self._send_socket.sendto(payload, peer)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    self._remove(peer)
+                except BlockingIOError:
+                    logger.warning("Invalidation dropped for %s, its socket buffer is full", peer)
+
+    def _payloads(self, changes: list[ModelChanges]) -> Iterable[bytes]:
+        payload = encode_changes(changes)
+        if len(payload) <= self.max_datagram_size:
+            yield payload
+            return
+        for change in changes:
+            payload = encode_changes([change])
+            if len(payload) > self.max_datagram_size:
+                payload = encode_changes([ModelChanges(change.model, change.tables, None)])
+            yield payload
+
+    @staticmethod
+    def _remove(peer: str):
+        try:
+            os.unlink(peer)
+        except FileNotFoundError:
+            pass
+
+    async def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            self._remove(self.path)
+        if self._send_socket is not None:
+            self._send_socket.close()
+            self._send_socket = None
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, receive: Callable[[list[ModelChanges]], None]):
+        self.receive = receive
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            changes = decode_changes(data)
+        except (ValueError, KeyError, TypeError):
+            logger.exception("Malformed invalidation message")
+            return
+        self.receive(changes)
+
+
+class InvalidationBus:
+    """
+    Fans the rows changed by each commit out to subscribers in this process and, through the transport, in the others,
+    so that caches can drop exactly the entries that went stale instead of waiting for their TTL.
+    """
+
+    def __init__(self, transport: AbstractInvalidationTransport | None = None):
+        self.transport = transport or InProcessTransport()
+        self._subscribers: list[tuple[str | None, Subscriber]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def subscribe(self, subscriber: Subscriber, model: str | None = None):
+        """
+        `subscriber` is called with the changes of `model` (of every model when None); it may be a coroutine function.
+        """
+        self._subscribers.append((model, subscriber))
+
+    async def start(self):
+        await self.transport.start(self._deliver_received)
+
+    async def close(self):
+        await self.transport.close()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def publish(self, changes: list[ModelChanges]):
+        if not changes:
+            return
+        try:
+            self.transport.send(changes)
+        except Exception:
+            logger.exception("Failed to send invalidation to other processes")
+        await self._deliver(changes)
+
+    async def _deliver(self, changes: list[ModelChanges]):
+        for model, subscriber in self._subscribers:
+            selected = changes if model is None else [change for change in changes if change.model == model]
+            if not selected:
+                continue
+            try:
+                res = subscriber(selected)
+                if isawaitable(res):
+                    await res
+            except Exception:
+                logger.exception("Invalidation subscriber %s failed", subscriber)
+
+    def _deliver_received(self, changes: list[ModelChanges]):
+        task = asyncio.get_running_loop().create_task(self._deliver(changes))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def invalidate_cached(cached_fn, to_args: Callable[[tuple], tuple]) -> Subscriber:
+    """
+    Subscriber dropping the entries of an `alru_cache` / `timed_lru_cache` function for the changed rows:
+    `to_args` maps a primary key identity to the arguments the function was called with.
+    The whole cache is cleared when the changed rows aren't listed.
+    """
+
+    def subscriber(changes: list[ModelChanges]):
+        for change in changes:
+            if change.keys is None:
+                cached_fn.cache_clear()
+                return
+            for key in change.keys:
+                cached_fn.invalidate(*to_args(key))
+
+    return subscriber
+
+
+def build_invalidation_bus() -> InvalidationBus | None:
+    setting = config.QUERY_CACHE_SETTING
+    match setting.INVALIDATION_TRANSPORT:
+        case "unix":
+            return InvalidationBus(UnixDatagramTransport(setting.INVALIDATION_SOCKET_DIR))
+        case "local":
+            return InvalidationBus(InProcessTransport())
+        case _:
+            return None
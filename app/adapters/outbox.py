@@ -0,0 +1,42 @@
+import pickle
+import zlib
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, MetaData, String, Table
+
+from app.domain.events import Event
+
+
+def outbox_table(metadata: MetaData) -> Table:
+    return Table(
+        "outbox",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("aggregate_id", String(64), nullable=True),
+        Column("partition_key", Integer, nullable=False, default=0),
+        Column("event_type", String(255), nullable=False),
+        Column("payload", LargeBinary, nullable=False),
+        Column("attempts", Integer, nullable=False, default=0),
+        Column("create_dt", DateTime, nullable=False, default=datetime.utcnow),
+        Column("processed_dt", DateTime, nullable=True, index=True),
+    )
+
+
+def partition_key(aggregate_id) -> int:
+    # Stable across processes (unlike hash()) and kept within a signed 32-bit column.
+    return zlib.crc32(str(aggregate_id).encode()) & 0x7FFFFFFF
+
+
+def to_row(aggregate, event: Event) -> dict:
+    aggregate_id = getattr(aggregate, "id", None)
+    return {
+        "aggregate_id": str(aggregate_id) if aggregate_id is not None else None,
+        "partition_key": partition_key(aggregate_id) if aggregate_id is not None else 0,
+        "event_type": type(event).__name__,
+        # The outbox is only ever read back by this service, so events are stored as-is.
+        "payload": pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+
+
+def load_event(payload: bytes) -> Event:
+    return pickle.loads(payload)
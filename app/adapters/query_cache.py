@@ -0,0 +1,343 @@
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+
+from sqlalchemy.sql.selectable import Select
+from sqlalchemy.sql.util import find_tables
+
+from app import config
+from app.adapters.invalidation import InvalidationBus
+from app.common.codec import decode_value, encode_value
+
+logger = logging.getLogger(__name__)
+
+CachedRows = tuple[list[str], list[tuple]]
+
+
+def dumps(rows: CachedRows) -> bytes:
+    # Not pickled: L2 is shared, and whoever can write to it must not get to run code in every process reading it.
+    keys, values = rows
+    payload = {"k": keys, "r": [[encode_value(value) for value in row] for row in values]}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def loads(payload: bytes) -> CachedRows:
+    decoded = json.loads(payload)
+    return list(decoded["k"]), [tuple(decode_value(value) for value in row) for row in decoded["r"]]
+
+
+def query_key(query: Select, dialect) -> str:
+    compiled = query.compile(dialect=dialect)
+    params = sorted(compiled.params.items())
+    return "q:" + hashlib.blake2b(f"{compiled}|{params!r}".encode(), digest_size=16).hexdigest()
+
+
+def query_tags(query: Select) -> frozenset[str]:
+    return frozenset(table.name for table in find_tables(query, include_joins=True))
+
+
+class AbstractCacheBackend(abc.ABC):
+    """
+    The shared (L2) tier: values are opaque bytes, keys are grouped under tags so they can be dropped together.
+    Every tag has a version, bumped when it is invalidated: a value is only stored if the versions of its tags
+    are still those read before it was loaded, so a load that raced a commit can't put stale rows back.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def versions(self, tags: Iterable[str]) -> dict[str, int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float, versions: dict[str, int]) -> bool:
+        """
+        Stores `value` under the tags in `versions` unless one of them was invalidated since; returns whether it did.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InMemoryCacheBackend(AbstractCacheBackend):
+    """
+    Stand-in for Redis in tests and local runs; only shared within the process.
+    """
+
+    def __init__(self):
+        self._values: dict[str, tuple[bytes, float]] = {}
+        self._tags: dict[str, set[str]] = {}
+        self._versions: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            value, expires_at = self._values[key]
+        except KeyError:
+            return None
+        if time.monotonic() >= expires_at:
+            del self._values[key]
+            return None
+        return value
+
+    async def versions(self, tags: Iterable[str]) -> dict[str, int]:
+        return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    async def set(self, key: str, value: bytes, ttl: float, versions: dict[str, int]) -> bool:
+        if any(self._versions.get(tag, 0) != version for tag, version in versions.items()):
+            return False
+        self._values[key] = (value, time.monotonic() + ttl)
+        for tag in versions:
+            self._tags.setdefault(tag, set()).add(key)
+        return True
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            for key in self._tags.pop(tag, ()):
+                self._values.pop(key, None)
+
+
+class RedisCacheBackend(AbstractCacheBackend):
+    # KEYS: tag set, version key, ... pairs. Drops every key of the tag sets and the sets themselves,
+    # and bumps the versions, in one atomic step.
+    _INVALIDATE_SCRIPT = """
+    for i = 1, #KEYS, 2 do
+        local members = redis.call('SMEMBERS', KEYS[i])
+        for _, key in ipairs(members) do
+            redis.call('DEL', key)
+        end
+        redis.call('DEL', KEYS[i])
+        redis.call('INCR', KEYS[i + 1])
+    end
+    """
+
+    # KEYS: the value key, then tag set, version key, ... pairs; ARGV: value, ttl in ms, then the expected versions.
+    # Sets the value only if no version changed; the tag set lives as long as its newest member.
+    _SET_SCRIPT = """
+    for i = 2, #KEYS, 2 do
+        if tonumber(redis.call('GET', KEYS[i + 1]) or '0') ~= tonumber(ARGV[2 + i / 2]) then
+            return 0
+        end
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    for i = 2, #KEYS, 2 do
+        redis.call('SADD', KEYS[i], KEYS[1])
+        redis.call('PEXPIRE', KEYS[i], ARGV[2])
+    end
+    return 1
+    """
+
+    def __init__(self, host: str, port: int, prefix: str = "review:", **kwargs):
+        from redis import asyncio as aioredis
+
+        self.redis = aioredis.Redis(host=host, port=port, **kwargs)
+        self.prefix = prefix
+        self._invalidate = self.redis.register_script(self._INVALIDATE_SCRIPT)
+        self._set = self.redis.register_script(self._SET_SCRIPT)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _version_key(self, tag: str) -> str:
+        # Never expires: one per table, and a version that disappeared would look unchanged to a racing load.
+        return f"{self.prefix}ver:{tag}"
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.redis.get(self.prefix + key)
+
+    async def versions(self, tags: Iterable[str]) -> dict[str, int]:
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = await self.redis.mget([self._version_key(tag) for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    async def set(self, key: str, value: bytes, ttl: float, versions: dict[str, int]) -> bool:
+        ttl_ms = max(int(ttl * 1000), 1)
+        keys = [self.prefix + key]
+        for tag in versions:
+            keys += [self._tag_key(tag), self._version_key(tag)]
+        return bool(await self._set(keys=keys, args=[value, ttl_ms, *versions.values()]))
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        keys = [key for tag in tags for key in (self._tag_key(tag), self._version_key(tag))]
+        if keys:
+            await self._invalidate(keys=keys)
+
+    async def close(self):
+        await self.redis.close()
+
+
+class QueryCache:
+    """
+    Read-through cache of query results in two tiers: a small per-process LRU (L1) in front of a shared backend (L2).
+    Entries are tagged with the tables the query reads and dropped from both tiers when a commit writes to one of them;
+    other processes only see that in L2, so L1 entries are kept short-lived.
+    """
+
+    def __init__(
+        self,
+        backend: AbstractCacheBackend | None = None,
+        ttl: float = 60.0,
+        l1_maxsize: int = 1024,
+        l1_ttl: float = 5.0,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.l1_maxsize = l1_maxsize
+        self.l1_ttl = l1_ttl
+        self._l1: OrderedDict[str, tuple[CachedRows, float, frozenset[str]]] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        # Bumped per tag on every invalidation seen by this process, so that loads which raced one aren't kept in L1.
+        self._generations: dict[str, int] = {}
+        self.l1_hits = self.l2_hits = self.misses = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        tags: frozenset[str],
+        load: Callable[[], Awaitable[CachedRows]],
+        ttl: float | None = None,
+    ) -> CachedRows:
+        if (rows := self._l1_get(key)) is not None:
+            self.l1_hits += 1
+            return rows
+
+        # Concurrent misses on the same key wait for the first one instead of all running the query.
+        if (pending := self._pending.get(key)) is not None:
+            return await asyncio.shield(pending)
+
+        fut = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            rows = await self._load(key, tags, load, self.ttl if ttl is None else ttl)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            # Retrieved so that an exception nobody else was waiting for isn't reported as never retrieved.
+            fut.exception()
+            raise
+        else:
+            fut.set_result(rows)
+            return rows
+        finally:
+            del self._pending[key]
+
+    async def _load(self, key, tags, load, ttl) -> CachedRows:
+        # Taken before anything is read: when a commit invalidates one of the tags in the meantime,
+        # what is read may predate it and is returned to this caller but not cached.
+        generation = self._generation(tags)
+        fresh = True
+        if (cached := await self._l2_get(key)) is not None:
+            self.l2_hits += 1
+            rows = cached
+        elif self.backend is None:
+            self.misses += 1
+            rows = await load()
+        else:
+            self.misses += 1
+            versions = await self.backend.versions(tags)
+            rows = await load()
+            fresh = await self._l2_set(self.backend, key, rows, ttl, versions)
+        if fresh and self._generation(tags) == generation:
+            self._l1_set(key, rows, min(ttl, self.l1_ttl), tags)
+        return rows
+
+    async def _l2_get(self, key: str) -> CachedRows | None:
+        if self.backend is None or (payload := await self.backend.get(key)) is None:
+            return None
+        try:
+            return loads(payload)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Unreadable query cache entry %s, loading it again", key)
+            return None
+
+    @staticmethod
+    async def _l2_set(backend: AbstractCacheBackend, key: str, rows: CachedRows, ttl, versions) -> bool:
+        try:
+            payload = dumps(rows)
+        except (ValueError, TypeError):
+            # A column type without a tag in the codec: kept in this process only.
+            logger.warning("Rows of query cache entry %s can't be serialised, not storing them in L2", key)
+            return True
+        return await backend.set(key, payload, ttl, versions)
+
+    def _generation(self, tags: frozenset[str]) -> list[int]:
+        return [self._generations.get(tag, 0) for tag in tags]
+
+    async def invalidate(self, tags: Iterable[str]):
+        tags = frozenset(tags)
+        if not tags:
+            return
+        self.invalidate_local(tags)
+        if self.backend is not None:
+            await self.backend.invalidate_tags(tags)
+
+    def invalidate_local(self, tags: Iterable[str]):
+        """
+        Drops the L1 entries only, for commits made by other processes: those already invalidated L2 themselves.
+        """
+        tags = frozenset(tags)
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        for key in [key for key, (_, _, entry_tags) in self._l1.items() if entry_tags & tags]:
+            del self._l1[key]
+
+    def subscribe(self, bus: InvalidationBus):
+        bus.subscribe(lambda changes: self.invalidate_local(table for change in changes for table in change.tables))
+
+    def clear(self):
+        self._l1.clear()
+
+    def _l1_get(self, key: str) -> CachedRows | None:
+        try:
+            rows, expires_at, _ = self._l1[key]
+        except KeyError:
+            return None
+        if time.monotonic() >= expires_at:
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return rows
+
+    def _l1_set(self, key: str, rows: CachedRows, ttl: float, tags: frozenset[str]):
+        if ttl <= 0:
+            return
+        self._l1[key] = (rows, time.monotonic() + ttl, tags)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_maxsize:
+            self._l1.popitem(last=False)
+
+
+def build_query_cache() -> QueryCache | None:
+    setting = config.QUERY_CACHE_SETTING
+    match setting.QUERY_CACHE_BACKEND:
+        case "redis":
+            backend: AbstractCacheBackend | None = RedisCacheBackend(
+                host=config.REDIS_SETTING.REDIS_HOST, port=config.REDIS_SETTING.REDIS_PORT
+            )
+        case "memory":
+            backend = InMemoryCacheBackend()
+        case "local":
+            backend = None
+        case _:
+            return None
+    return QueryCache(
+        backend,
+        ttl=setting.QUERY_CACHE_TTL,
+        l1_maxsize=setting.QUERY_CACHE_L1_SIZE,
+        l1_ttl=setting.QUERY_CACHE_L1_TTL,
+    )
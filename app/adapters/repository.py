@@ -1,24 +1,290 @@
 from __future__ import annotations
 
+import base64
+import json
+import operator
 from abc import ABC, abstractmethod
 from asyncio import iscoroutinefunction
-from collections.abc import Callable
-from functools import wraps
-from typing import Generic, Literal, Type, TypeVar
-
-from sqlalchemy import and_, func, or_
+from collections import namedtuple
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from dataclasses import dataclass, field
+from functools import _make_key, lru_cache, partial, wraps
+from typing import Any, Generic, Literal, NamedTuple, Type, TypeVar, cast
+
+from sqlalchemy import and_, func, insert, inspect, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import contains_eager, selectinload
+from sqlalchemy.orm import contains_eager, joinedload, raiseload, selectinload, subqueryload
 from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.sql.operators import ColumnOperators
 from sqlalchemy.sql.selectable import Select
 
-from app.common.cache_utils import timed_lru_cache
+from app.common.cache_utils import EVICTION_POLICY, timed_lru_cache
+from app.common.codec import decode_value, encode_value
 
-from .exceptions import AttributeNotExist, InvalidConditionGiven
+from .exceptions import AttributeNotExist, InvalidConditionGiven, NotSupportedDialect
+from .invalidation import mark_changed_keys
+from .query_cache import CachedRows, QueryCache, query_key, query_tags
 
 ModelType = TypeVar("ModelType", bound=object)
 LOGICAL_OPERATOR = Literal["and", "or"]
+CURSOR_DIRECTION = Literal["next", "prev"]
+ROW_FORMAT = Literal["tuple", "namedtuple", "dict"]
+LOADER_STRATEGY = Literal["selectin", "joined", "subquery", "raiseload", "contains_eager"]
+LOADERS: dict[str, Callable] = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "subquery": subqueryload,
+    "raiseload": raiseload,
+    "contains_eager": contains_eager,
+}
+
+FILTER_OPERATORS: dict[str, Callable] = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": ColumnOperators.in_,
+    "not_in": ColumnOperators.not_in,
+    "btw": lambda col, val: col.between(*val),
+    "range": lambda col, val: or_(*(col.between(*var) for var in val)),
+}
+
+AGGREGATE_FUNCTIONS: dict[str, Callable] = {
+    "count": func.count,
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+# Percentiles are ordered-set aggregates, which only PostgreSQL has. "pNN" is accepted besides these.
+PERCENTILES: dict[str, float] = {"median": 0.5}
+
+
+def _percentile(op: str) -> float | None:
+    if op in PERCENTILES:
+        return PERCENTILES[op]
+    if op.startswith("p") and op[1:].isdigit() and 0 < int(op[1:]) < 100:
+        return int(op[1:]) / 100
+    return None
+
+
+@lru_cache(maxsize=None)
+def filter_builders(model: type) -> dict[str, Callable]:
+    """
+    "colname__operator" -> callable building the condition for a value, computed once per model.
+    Values end up as bound parameters, so statements differing only in values share SQLAlchemy's compiled cache.
+    """
+    builders: dict[str, Callable] = {}
+    for col_name in inspect(model).all_orm_descriptors.keys():
+        col = getattr(model, col_name)
+        for op, build in FILTER_OPERATORS.items():
+            builders[f"{col_name}__{op}"] = partial(build, col)
+    return builders
+
+
+def repository_method_key(repository, *args, **kwargs):
+    return repository.model, _make_key(args, kwargs, False)
+
+
+@lru_cache(maxsize=None)
+def row_class(model: type, keys: tuple[str, ...]) -> type[NamedTuple]:
+    # namedtuple classes declare empty __slots__, so their rows are as small as plain tuples.
+    return cast("type[NamedTuple]", namedtuple(f"{model.__name__}Row", keys))
+
+
+@dataclass
+class CursorPage:
+    items: list = field(default_factory=list)
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+def encode_cursor(ordering: list[str], values: list, direction: CURSOR_DIRECTION) -> str:
+    payload = {"o": ordering, "v": [encode_value(v) for v in values], "d": direction}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str, ordering: list[str]) -> tuple[list, CURSOR_DIRECTION]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_ordering, direction = payload["o"], payload["d"]
+        values = [decode_value(v) for v in payload["v"]]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidConditionGiven("Malformed Cursor Given")
+    if cursor_ordering != ordering or direction not in ("next", "prev"):
+        raise InvalidConditionGiven("Cursor Was Issued For A Different Ordering")
+    if len(values) != len(ordering):
+        raise InvalidConditionGiven("Malformed Cursor Given")
+    return values, direction
+
+
+@dataclass
+class RefreshStats:
+    ran: int = 0
+    skipped: int = 0
+
+
+@lru_cache(maxsize=None)
+def has_server_side_defaults(model: type) -> bool:
+    return any(
+        column.server_default is not None or column.server_onupdate is not None for column in inspect(model).columns
+    )
+
+
+@dataclass(frozen=True)
+class LoaderTree:
+    joins: tuple = ()
+    options: tuple = ()
+    # Joined eager loads of collections repeat the parent row, so results have to be uniqued.
+    unique: bool = False
+
+
+@lru_cache(maxsize=None)
+def loader_tree(
+    model: type, max_depth: int | None = None, strategies: tuple[tuple[str, LOADER_STRATEGY], ...] = ()
+) -> LoaderTree:
+    """
+    Eager-load options for the `__childs__` / `__parents__` graph of a model, built once per model and arguments.
+    Children are selectin loaded and parents joined with contains_eager unless `strategies` overrides it
+    for a relationship path such as "items" or "items.options". Nothing below a raiseload is walked.
+    """
+    overrides = dict(strategies)
+    joins: list = []
+    options: list = []
+    unique = False
+
+    def walk(current, relationships: str, loader, path: str, depth: int, visited: frozenset, joined_path: bool):
+        keys = getattr(current, relationships, [])
+        if not keys or (max_depth is not None and depth >= max_depth):
+            if loader is not None:
+                options.append(loader)
+            return
+        for key in keys:
+            attribute = getattr(current, key)
+            target = attribute.property.mapper.class_
+            key_path = f"{path}.{key}" if path else key
+            strategy = overrides.get(key_path, "selectin" if relationships == "__childs__" else "contains_eager")
+            if strategy == "contains_eager" and not joined_path:
+                # contains_eager needs every relationship above it to be joined into the query as well.
+                strategy = "joined"
+            if strategy == "contains_eager":
+                joins.append(attribute)
+            if strategy == "joined" and attribute.property.uselist:
+                nonlocal unique
+                unique = True
+            load = LOADERS[strategy] if loader is None else getattr(loader, LOADERS[strategy].__name__)
+            if strategy == "raiseload" or target in visited:
+                options.append(load(attribute))
+                continue
+            walk(
+                target,
+                relationships,
+                load(attribute),
+                key_path,
+                depth + 1,
+                visited | {target},
+                joined_path and strategy == "contains_eager",
+            )
+
+    walk(model, "__childs__", None, "", 0, frozenset({model}), False)
+    walk(model, "__parents__", None, "", 0, frozenset({model}), True)
+    return LoaderTree(joins=tuple(joins), options=tuple(options), unique=unique)
+
+
+def _apply_client_side_defaults(mapper, models: Sequence):
+    # Core inserts only apply Python-side defaults to keys that are missing from the statement,
+    # so they are evaluated here and set on the models, which also makes client-generated keys known up front.
+    for prop in mapper.column_attrs:
+        default = prop.columns[0].default
+        if default is None or default.is_sequence or default.is_clause_element:
+            continue
+        for model in models:
+            if getattr(model, prop.key, None) is None:
+                setattr(model, prop.key, default.arg(None) if default.is_callable else default.arg)
+
+
+@dataclass(frozen=True)
+class IdentityMapSnapshot:
+    models: dict[type, dict[Any, Any]]
+    transient: dict[type, dict[int, Any]]
+    events: list[tuple[Any, tuple]]
+
+
+class IdentityMap:
+    """
+    Models seen by a repository, keyed by (model type, primary key).
+    Models without a primary key yet are held by their object identity, and moved under their primary key
+    by the first lookup of their type once they got one, usually from a flush.
+    """
+
+    def __init__(self):
+        self._models: dict[type, dict[Any, Any]] = {}
+        self._transient: dict[type, dict[int, Any]] = {}
+
+    @staticmethod
+    def _pk(model) -> Any:
+        return getattr(model, "id", None)
+
+    def _settle(self, model_type: type):
+        if not (transient := self._transient.get(model_type)):
+            return
+        models = self._models.setdefault(model_type, {})
+        for key, model in list(transient.items()):
+            if (pk := self._pk(model)) is None:
+                continue
+            del transient[key]
+            if (existing := models.setdefault(pk, model)) is not model:
+                existing.events.extend(model.events)
+
+    def add(self, model):
+        if (pk := self._pk(model)) is None:
+            return self._transient.setdefault(type(model), {}).setdefault(id(model), model)
+        self._settle(type(model))
+        return self._models.setdefault(type(model), {}).setdefault(pk, model)
+
+    def get(self, model_type: type, pk):
+        self._settle(model_type)
+        return self._models.get(model_type, {}).get(pk)
+
+    def find(self, model):
+        if (pk := self._pk(model)) is None:
+            return self._transient.get(type(model), {}).get(id(model))
+        return self.get(type(model), pk)
+
+    def of_type(self, model_type: type) -> list:
+        self._settle(model_type)
+        return [*self._models.get(model_type, {}).values(), *self._transient.get(model_type, {}).values()]
+
+    def snapshot(self) -> IdentityMapSnapshot:
+        return IdentityMapSnapshot(
+            models={model_type: dict(models) for model_type, models in self._models.items()},
+            transient={model_type: dict(models) for model_type, models in self._transient.items()},
+            events=[(model, tuple(model.events)) for model in self],
+        )
+
+    def restore(self, snapshot: IdentityMapSnapshot):
+        """
+        Back to the models and the buffered events of `snapshot`: what was seen or raised since is forgotten.
+        """
+        self._models, self._transient = snapshot.models, snapshot.transient
+        for model, events in snapshot.events:
+            model.events.clear()
+            model.events.extend(events)
+
+    def __contains__(self, model) -> bool:
+        return self.find(model) is not None
+
+    def __iter__(self) -> Iterator:
+        for model_type in dict.fromkeys([*self._models, *self._transient]):
+            yield from self.of_type(model_type)
+
+    def __len__(self) -> int:
+        for model_type in list(self._transient):
+            self._settle(model_type)
+        return sum(len(models) for models in (*self._models.values(), *self._transient.values()))
 
 
 class RepositoryDecorators:
@@ -44,12 +310,17 @@ class RepositoryDecorators:
     @staticmethod
     def event_gatherer(func):
         @wraps(func)
-        async def async_wrapper(self: AsyncSqlAlchemyRepository, *args, **kwargs):
+        async def async_wrapper(self: AsyncSqlAlchemyRepository, *args, refresh: bool = False, **kwargs):
             res = await func(self, *args, **kwargs)
-            if res and isinstance(res, type(self.model)):
+            if res and isinstance(res, self.model):
                 if existing_model := self._check_existing_object(res):
                     self._add_up_events(existing_model=existing_model, model=res)
-                await self.session.refresh(res)
+                if self._needs_refresh(res, refresh):
+                    await self.session.refresh(res)
+                    self._refresh_pending.discard(id(res))
+                    self.refresh_stats.ran += 1
+                else:
+                    self.refresh_stats.skipped += 1
                 self.seen.add(res)
             return res
 
@@ -68,8 +339,28 @@ class RepositoryDecorators:
             return sync_wrapper
 
     @staticmethod
-    def caching(seconds: int, maxsize: int = 128):
-        return timed_lru_cache(seconds, maxsize=maxsize)
+    def caching(
+        seconds: float,
+        maxsize: int = 128,
+        stale_seconds: float = 0,
+        maxbytes: int | None = None,
+        policy: EVICTION_POLICY = "lru",
+        max_inflight: int | None = None,
+    ):
+        """
+        Entries are keyed on the repository's model and the call arguments, not on the repository instance,
+        so they are shared across units of work. Only meant for methods whose result depends on nothing else.
+        Methods returning large lists should set `maxbytes`, which bounds the memory the cache holds.
+        """
+        return timed_lru_cache(
+            seconds,
+            maxsize=maxsize,
+            stale_seconds=stale_seconds,
+            key=repository_method_key,
+            maxbytes=maxbytes,
+            policy=policy,
+            max_inflight=max_inflight,
+        )
 
 
 class AbstractRepository(ABC):
@@ -77,8 +368,8 @@ class AbstractRepository(ABC):
         self._add(model)
 
     @RepositoryDecorators.query_resetter
-    async def get(self):
-        return await self._get()
+    async def get(self, refresh: bool = False):
+        return await self._get(refresh=refresh)
 
     @RepositoryDecorators.query_resetter
     async def list(self, scalar=True):
@@ -88,12 +379,46 @@ class AbstractRepository(ABC):
         self._filter(logical_operator=logical_operator, **kwargs)
         return self
 
+    async def bulk_add(self, models: Sequence, chunk_size: int = 1000, return_keys: bool = False):
+        return await self._bulk_add(models, chunk_size=chunk_size, return_keys=return_keys)
+
+    async def bulk_upsert(
+        self,
+        models: Sequence,
+        conflict_columns: Sequence[str] = ("id",),
+        update_columns: Sequence[str] | None = None,
+        chunk_size: int = 1000,
+        return_keys: bool = False,
+    ):
+        return await self._bulk_upsert(
+            models,
+            conflict_columns=conflict_columns,
+            update_columns=update_columns,
+            chunk_size=chunk_size,
+            return_keys=return_keys,
+        )
+
     @abstractmethod
     def _add(self):
         raise NotImplementedError
 
     @abstractmethod
-    async def _get(self):
+    async def _bulk_add(self, models: Sequence, chunk_size: int, return_keys: bool):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _bulk_upsert(
+        self,
+        models: Sequence,
+        conflict_columns: Sequence[str],
+        update_columns: Sequence[str] | None,
+        chunk_size: int,
+        return_keys: bool,
+    ):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _get(self, refresh: bool = False):
         raise NotImplementedError
 
     @abstractmethod
@@ -118,24 +443,135 @@ class AbstractRepository(ABC):
 
 
 class AsyncSqlAlchemyRepository(Generic[ModelType], AbstractRepository):
-    def __init__(self, *, model: Type[ModelType], session: AsyncSession):
+    def __init__(self, *, model: Type[ModelType], session: AsyncSession, query_cache: QueryCache | None = None):
         self.model = model
+        self.query_cache = query_cache
+        self._cache_ttl: float | None = None
+        self._use_cache = False
         self._base_query: Select = select(self.model)
+        self._ordering: list[tuple[str, bool]] = []
+        self._unique = False
+        self._projection: tuple[str, ...] = ()
+        self._aggregates: dict[str, Any] = {}
+        self._grouping: list[InstrumentedAttribute] = []
         self.session = session
-        self.seen: set = set()
+        self.seen: IdentityMap = IdentityMap()
+        self.refresh_stats = RefreshStats()
+        # ids of added models whose server-side defaults have to be loaded once they are flushed.
+        self._refresh_pending: set[int] = set()
 
     @RepositoryDecorators.event_gatherer
     def _add(self, model):
         self.session.add(model)
+        if has_server_side_defaults(type(model)):
+            self._refresh_pending.add(id(model))
+        return model
+
+    def _create(self, **kwargs):
+        model = self.model.create(**kwargs)
+        self._add(model)
         return model
 
     @RepositoryDecorators.event_gatherer
     async def _get(self):
         q = await self.session.execute(self._base_query.limit(1))
+        if self._unique:
+            q = q.unique()
         return q.scalars().first()
 
+    async def _bulk_add(self, models: Sequence, chunk_size: int, return_keys: bool):
+        return await self._bulk_insert(models, chunk_size=chunk_size, return_keys=return_keys)
+
+    async def _bulk_upsert(
+        self,
+        models: Sequence,
+        conflict_columns: Sequence[str],
+        update_columns: Sequence[str] | None,
+        chunk_size: int,
+        return_keys: bool,
+    ):
+        def on_conflict(stmt, columns: list[str]):
+            set_columns = update_columns or [c for c in columns if c not in conflict_columns]
+            return stmt.on_conflict_do_update(
+                index_elements=list(conflict_columns), set_={c: stmt.excluded[c] for c in set_columns}
+            )
+
+        return await self._bulk_insert(models, chunk_size=chunk_size, return_keys=return_keys, on_conflict=on_conflict)
+
+    async def _bulk_insert(self, models: Sequence, chunk_size: int, return_keys: bool, on_conflict=None):
+        """
+        INSERT (or upsert) of many models at once, bypassing the ORM flush.
+        Models are registered in `seen` like `add` does so their events are still collected,
+        but they are not attached to the session.
+        """
+        if not models:
+            return [] if return_keys else None
+
+        mapper = inspect(self.model)
+        dialect = self._dialect_name()
+        match dialect:
+            case "postgresql":
+                dialect_insert = postgresql.insert
+            case "sqlite":
+                dialect_insert = sqlite.insert
+            case _ if on_conflict is None:
+                dialect_insert = insert
+            case _:
+                raise NotSupportedDialect(f"Upsert Is Not Supported For {dialect}")
+
+        pk_keys = [mapper.get_property_by_column(col).key for col in mapper.primary_key]
+        _apply_client_side_defaults(mapper, models)
+        rows = [{prop.columns[0].key: getattr(model, prop.key) for prop in mapper.column_attrs} for model in models]
+        # Columns left unset that the database fills in itself are left out of the statement altogether.
+        columns = [
+            prop.columns[0].key
+            for prop in mapper.column_attrs
+            if prop.columns[0].server_default is None or any(row[prop.columns[0].key] is not None for row in rows)
+        ]
+        rows = [{key: row[key] for key in columns} for row in rows]
+
+        stmt = dialect_insert(mapper.local_table)
+        if on_conflict is not None:
+            stmt = on_conflict(stmt, columns)
+
+        need_returning = return_keys and any(getattr(model, key) is None for model in models for key in pk_keys)
+        if need_returning and dialect != "postgresql":
+            raise NotSupportedDialect(f"Returning Generated Keys Is Not Supported For {dialect}")
+
+        for offset in range(0, len(models), chunk_size):
+            end = offset + chunk_size
+            if not need_returning:
+                # executemany over one statement: compiled once and cached, unlike a VALUES list per chunk.
+                await self.session.execute(stmt, rows[offset:end])
+                continue
+            # Keys generated by the database can only come back through RETURNING on a multi-row VALUES.
+            chunk_stmt = dialect_insert(mapper.local_table).values(rows[offset:end])
+            if on_conflict is not None:
+                chunk_stmt = on_conflict(chunk_stmt, columns)
+            result = await self.session.execute(chunk_stmt.returning(*mapper.primary_key))
+            for model, returned in zip(models[offset:end], result.all()):
+                for key, value in zip(pk_keys, returned):
+                    setattr(model, key, value)
+
+        # Written with Core, so the flush listener doesn't see these rows.
+        mark_changed_keys(
+            self.session.sync_session, self.model, [tuple(getattr(model, key) for key in pk_keys) for model in models]
+        )
+        for model in models:
+            if existing_model := self._check_existing_object(model):
+                self._add_up_events(existing_model=existing_model, model=model)
+            self.seen.add(model)
+
+        if return_keys:
+            return [
+                getattr(model, pk_keys[0]) if len(pk_keys) == 1 else tuple(getattr(model, key) for key in pk_keys)
+                for model in models
+            ]
+
     async def _list(self, scalar=True):
         q = await self.session.execute(self._base_query)
+        if self._unique:
+            q = q.unique()
         if scalar:
             return q.scalars().all()
         else:
@@ -145,65 +581,89 @@ class AsyncSqlAlchemyRepository(Generic[ModelType], AbstractRepository):
         """
         colname__operator = value
         """
+        builders = filter_builders(cast(type, self.model))
         cond = []
 
         for key, val in kwargs.items():
-            match key.split("__"):
-                case [col_name, op]:
-                    try:
-                        col = getattr(self.model, col_name)
-                    except AttributeError:
-                        raise InvalidConditionGiven(f"No Such Column Exist For This Model: {str(self.model)}")
-                    else:
-                        if op == "eq":
-                            cond.append((col == val))
-                        elif op == "gt":
-                            cond.append((col > val))
-                        elif op == "gte":
-                            cond.append((col >= val))
-                        elif op == "lt":
-                            cond.append((col < val))
-                        elif op == "lte":
-                            cond.append((col <= val))
-                        elif op == "in":
-                            cond.append((col.in_(val)))
-                        elif op == "not_in":
-                            cond.append((col.not_in(val)))
-                        elif op == "btw":
-                            cond.append((col.between(val)))
-                        elif op == "range":
-                            sub_cond = []
-                            for var in val:
-                                sub_cond.append((col.between(*var)))
-                            cond.append(or_(*sub_cond))
-                        else:
-                            InvalidConditionGiven(f"No Such Operation Exist: {op}")
-                case _:
-                    raise InvalidConditionGiven(
-                        "Filter Option Not Correctly Given. (Hint) Use The Following Format - colname__eq = value"
-                    )
+            try:
+                builder = builders[key]
+            except KeyError:
+                raise self._invalid_filter(key)
+            cond.append(builder(val))
 
         if logical_operator == "and":
             self._base_query = self._base_query.where(and_(*cond))
         else:
             self._base_query = self._base_query.where(or_(*cond))
 
-    def aggregate(self, *, attribute, func_name):
-        function = getattr(func, func_name)
-        if not isinstance(attribute, InstrumentedAttribute):
-            try:
-                attribute = getattr(self.model, attribute)
-            except AttributeError:
-                raise AttributeNotExist
-        self._base_query = select(attribute, function(attribute))
+    def _invalid_filter(self, key: str) -> InvalidConditionGiven:
+        match key.split("__"):
+            case [_, op]:
+                if op not in FILTER_OPERATORS:
+                    return InvalidConditionGiven(f"No Such Operation Exist: {op}")
+                return InvalidConditionGiven(f"No Such Column Exist For This Model: {str(self.model)}")
+            case _:
+                return InvalidConditionGiven(
+                    "Filter Option Not Correctly Given. (Hint) Use The Following Format - colname__eq = value"
+                )
 
-    def group_by(self, attribute):
-        if not isinstance(attribute, InstrumentedAttribute):
-            try:
-                attribute = getattr(self.model, attribute)
-            except AttributeError:
-                raise AttributeNotExist
-        self._base_query = self._base_query.group_by(attribute)
+    def aggregate(self, *, attribute=None, func_name: str | None = None, **aggregates: str):
+        """
+        label = "colname__function", e.g. aggregate(total="amount__sum", orders="id__count", p95="amount__p95")
+        Functions are count, sum, avg, min, max and, on PostgreSQL, median / pNN percentiles.
+        Filters applied so far are kept; with group_by there is one row per group, led by the group columns.
+        The single `attribute` / `func_name` form is kept and labelled "<func_name>_<colname>".
+        """
+        if attribute is not None:
+            col_name = attribute.key if isinstance(attribute, InstrumentedAttribute) else attribute
+            aggregates = {f"{func_name}_{col_name}": f"{col_name}__{func_name}", **aggregates}
+        if not aggregates:
+            raise InvalidConditionGiven("At Least One Aggregate Must Be Given")
+
+        for label, spec in aggregates.items():
+            match spec.split("__"):
+                case [col_name, op]:
+                    col = self._get_attr(col_name)
+                case _:
+                    raise InvalidConditionGiven(
+                        "Aggregate Not Correctly Given. (Hint) Use The Following Format - label = colname__sum"
+                    )
+            if op in AGGREGATE_FUNCTIONS:
+                expression = AGGREGATE_FUNCTIONS[op](col)
+            elif (fraction := _percentile(op)) is not None:
+                if (dialect := self._dialect_name()) != "postgresql":
+                    raise NotSupportedDialect(f"Percentile Is Not Supported For {dialect}")
+                expression = func.percentile_cont(fraction).within_group(col)
+            else:
+                raise InvalidConditionGiven(f"No Such Aggregate Function Exist: {op}")
+            self._aggregates[label] = expression.label(label)
+
+        self._select_aggregates()
+        return self
+
+    def group_by(self, *attributes):
+        for attribute in attributes:
+            if not isinstance(attribute, InstrumentedAttribute):
+                attribute = self._get_attr(attribute)
+            self._grouping.append(attribute)
+            self._base_query = self._base_query.group_by(attribute)
+        if self._aggregates:
+            self._select_aggregates()
+        return self
+
+    def _select_aggregates(self):
+        self._base_query = self._base_query.with_only_columns(*self._grouping, *self._aggregates.values())
+
+    @RepositoryDecorators.query_resetter
+    async def columns(self) -> dict[str, list]:
+        """
+        Column oriented result of the current query: {"label": [value, ...], ...}.
+        Meant for aggregate / group_by and only queries, whose result is cheap to serialise this way.
+        """
+        keys, rows = await self._fetch_rows()
+        if not rows:
+            return {key: [] for key in keys}
+        return {key: list(values) for key, values in zip(keys, zip(*rows))}
 
     def order_by(self, *args: str):
         for a in args:
@@ -214,75 +674,206 @@ class AsyncSqlAlchemyRepository(Generic[ModelType], AbstractRepository):
                 col_name = a
                 is_asc = True
             col = self._get_attr(col_name)
+            self._ordering.append((col_name, is_asc))
             self._base_query = self._base_query.order_by(col.asc()) if is_asc else self._base_query.order_by(col.desc())
+        return self
 
     def paginate(self, page, items_per_page):
         self._base_query = self._base_query.offset((page - 1) * items_per_page).limit(items_per_page)
+        return self
 
-    def load_relationships(self, load_target=None):
-        if not load_target:
-            self._loaders = []
-            # Recursive call
-            self._load_childs(model=self.model)
-            self._load_parents(model=self.model)
-            self._base_query = self._base_query.options(*self._loaders)
-        else:
-            self._load_target(load_target)
+    def cached(self, ttl: float | None = None):
+        """
+        Reads the result of the next `values` / `columns` call through the query cache, if the repository has one.
+        Entries are dropped when a unit of work commits a write to any table the query reads.
+        """
+        self._use_cache = self.query_cache is not None
+        self._cache_ttl = ttl
+        return self
 
-    def _load_childs(self, model=None, load=None):
-        if not (child_list := getattr(model, "__childs__", [])):
-            self._loaders.append(load)
-            return
+    async def _fetch_rows(self) -> CachedRows:
+        async def load() -> CachedRows:
+            result = await self.session.execute(self._base_query)
+            return list(result.keys()), [tuple(r) for r in result.all()]
+
+        if not self._use_cache or self.query_cache is None:
+            return await load()
+        dialect = self.session.sync_session.get_bind(inspect(self.model)).dialect
+        return await self.query_cache.get_or_load(
+            query_key(self._base_query, dialect), query_tags(self._base_query), load, ttl=self._cache_ttl
+        )
+
+    def only(self, *attributes: str):
+        """
+        Narrows the select down to the given columns, keeping the filters, ordering and pagination applied so far.
+        Rows are read back with `values`, without building ORM instances.
+        """
+        if not attributes:
+            raise InvalidConditionGiven("At Least One Column Must Be Given")
+        self._projection = attributes
+        self._base_query = self._base_query.with_only_columns(*(self._get_attr(a) for a in attributes))
+        return self
+
+    @RepositoryDecorators.query_resetter
+    async def values(self, *attributes: str, row: ROW_FORMAT = "tuple") -> list:
+        """
+        Plain rows of the columns given here or through `only`, as tuples, namedtuples or dicts.
+        Nothing goes through the identity map, so the rows are read-only snapshots.
+        """
+        if attributes:
+            self.only(*attributes)
+        elif not self._projection:
+            raise InvalidConditionGiven("No Columns Selected. (Hint) Call only(...) Or Pass Column Names")
+
+        _, rows = await self._fetch_rows()
+        match row:
+            case "tuple":
+                return [tuple(r) for r in rows]
+            case "namedtuple":
+                cls = row_class(cast(type, self.model), self._projection)
+                return [cls._make(r) for r in rows]
+            case "dict":
+                keys = self._projection
+                return [dict(zip(keys, r)) for r in rows]
+            case _:
+                raise InvalidConditionGiven(f"No Such Row Format: {row}")
+
+    @RepositoryDecorators.query_resetter
+    def stream(self, batch_size: int = 1000, scalar: bool = True) -> AsyncIterator[list]:
+        """
+        Yields the result in lists of at most `batch_size` models (or rows when `scalar` is False),
+        fetched through a server-side cursor so that only one batch is held in memory at a time.
+        The query is taken when `stream` is called, so the repository can be reused before the stream is consumed.
+        Collections loaded with the "joined" strategy can't be streamed: their rows would have to be uniqued,
+        which means holding on to every model; use "selectin" for them instead.
+        """
+        if self._unique:
+            raise InvalidConditionGiven("Joined Collection Loads Can't Be Streamed")
+        return self._stream(self._base_query.execution_options(yield_per=batch_size), batch_size, scalar)
+
+    async def _stream(self, query: Select, batch_size: int, scalar: bool) -> AsyncIterator[list]:
+        result = await self.session.stream(query)
+        try:
+            partitions = result.scalars().partitions(batch_size) if scalar else result.partitions(batch_size)
+            async for partition in partitions:
+                yield partition
+        finally:
+            await result.close()
+
+    @RepositoryDecorators.query_resetter
+    async def cursor_paginate(self, items_per_page: int, cursor: str | None = None) -> CursorPage:
+        """
+        Keyset pagination over the ordering given through `order_by`.
+        The primary key is appended as a tiebreaker so that the ordering is total,
+        and ordering columns are expected to be non-nullable.
+        """
+        ordering = list(self._ordering)
+        if "id" not in (col_name for col_name, _ in ordering):
+            ordering.append(("id", True))
+        ordering_key = [col_name if is_asc else f"-{col_name}" for col_name, is_asc in ordering]
+
+        values: list = []
+        direction: CURSOR_DIRECTION = "next"
+        if cursor is not None:
+            values, direction = decode_cursor(cursor, ordering_key)
+
+        # Walking backwards is walking forwards over the reversed ordering.
+        fetch_ordering = [(col_name, is_asc == (direction == "next")) for col_name, is_asc in ordering]
+        query = self._base_query.order_by(None)
+        if values:
+            query = query.where(self._keyset_condition(fetch_ordering, values))
+        for col_name, is_asc in fetch_ordering:
+            col = self._get_attr(col_name)
+            query = query.order_by(col.asc() if is_asc else col.desc())
+
+        result = await self.session.execute(query.limit(items_per_page + 1))
+        if self._unique:
+            result = result.unique()
+        items = list(result.scalars().all())
+        has_more = len(items) > items_per_page
+        items = items[:items_per_page]
+        if direction == "prev":
+            items.reverse()
+        if not items:
+            return CursorPage()
+
+        def cursor_for(item, to: CURSOR_DIRECTION) -> str:
+            return encode_cursor(ordering_key, [getattr(item, col_name) for col_name, _ in ordering], to)
+
+        if direction == "next":
+            next_cursor = cursor_for(items[-1], "next") if has_more else None
+            prev_cursor = cursor_for(items[0], "prev") if cursor is not None else None
         else:
-            # parent_name = model.__name__.lower()
-            for key in child_list:
-                child_model = getattr(self.model, key).property.mapper.class_
-                _load = (
-                    selectinload(getattr(self.model, key)) if not load else load.selectinload(getattr(self.model, key))
-                )
-                self._load_childs(model=child_model, load=_load)
+            next_cursor = cursor_for(items[-1], "next")
+            prev_cursor = cursor_for(items[0], "prev") if has_more else None
+        return CursorPage(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor)
 
-    def _load_parents(self, model=None, load=None):
-        if not (parents_list := getattr(model, "__parents__", [])):
-            self._loaders.append(load)
-            return
+    def _keyset_condition(self, ordering: list[tuple[str, bool]], values: list):
+        # (a, b) after (x, y)  =>  a > x OR (a = x AND b > y), with the comparison flipped for descending columns.
+        cond = []
+        for idx, (col_name, is_asc) in enumerate(ordering):
+            col = self._get_attr(col_name)
+            preceding = [self._get_attr(name) == value for (name, _), value in zip(ordering[:idx], values)]
+            cond.append(and_(*preceding, col > values[idx] if is_asc else col < values[idx]))
+        # The redundant bound on the leading column is what lets the planner range scan an index instead of
+        # evaluating the OR for every row.
+        first_col, first_is_asc = self._get_attr(ordering[0][0]), ordering[0][1]
+        return and_(first_col >= values[0] if first_is_asc else first_col <= values[0], or_(*cond))
+
+    def load_relationships(
+        self,
+        load_target=None,
+        max_depth: int | None = None,
+        strategies: dict[str, LOADER_STRATEGY] | None = None,
+    ):
+        if not load_target:
+            tree = loader_tree(cast(type, self.model), max_depth, tuple(sorted((strategies or {}).items())))
+            for attribute in tree.joins:
+                self._base_query = self._base_query.join(attribute)
+            self._base_query = self._base_query.options(*tree.options)
+            self._unique = self._unique or tree.unique
         else:
-            # parent_name = model.__name__.lower()
-            for key in parents_list:
-                parent_model = getattr(self.model, key).property.mapper.class_
-                self._base_query = self._base_query.join(getattr(self.model, key))
-                _load = (
-                    contains_eager(getattr(self.model, key))
-                    if not load
-                    else load.contains_eager(getattr(self.model, key))
-                )
-                self._load_parents(model=parent_model, load=_load)
+            self._load_target(load_target)
+        return self
 
     def _load_target(self, load_target):
-        for child in self.model.__childs__:
+        for child in getattr(self.model, "__childs__", []):
             attribute = getattr(self.model, child)
             if attribute.property.mapper.class_ == load_target.property.mapper.class_:
                 self._base_query = self._base_query.options(selectinload(attribute))
                 return
-        for parent in self.model.__parents__:
+        for parent in getattr(self.model, "__parents__", []):
             attribute = getattr(self.model, parent)
             if attribute.property.mapper.class_ == load_target.property.mapper.class_:
                 self._base_query = self._base_query.join(attribute).options(contains_eager(attribute))
                 return
 
+    def _needs_refresh(self, model, refresh: bool) -> bool:
+        if refresh or id(model) in self._refresh_pending:
+            return True
+        # Expired attributes would otherwise be lazy loaded on access, which isn't possible on an AsyncSession.
+        return bool(inspect(model).expired_attributes)
+
     def _check_existing_object(self, model):
-        for element in self.seen:
-            if type(model) != type(element):
-                return None
-            if model == element and hash(model) == hash(element):
-                return element
+        return self.seen.find(model)
 
     def _add_up_events(self, existing_model, model):
-        _type: Callable = type(existing_model.events)
-        existing_model.events = _type(dict.fromkeys(event for event in existing_model.events + model.events).keys())
+        if existing_model is model:
+            return
+        existing_model.events.extend(model.events)
 
     def _query_reset(self):
         self._base_query = select(self.model)
+        self._ordering = []
+        self._unique = False
+        self._projection = ()
+        self._aggregates = {}
+        self._grouping = []
+        self._use_cache = False
+        self._cache_ttl = None
+
+    def _dialect_name(self) -> str:
+        return self.session.sync_session.get_bind(inspect(self.model)).dialect.name
 
     def _get_attr(self, col_name=None):
         if col_name:
@@ -1,7 +1,13 @@
 import inspect
+from typing import Callable, Type
+
+from tenacity import AsyncRetrying
 
 from app.adapters import persistent_orm
+from app.domain import events
 from app.service_layer import handlers, messagebus, unit_of_work
+from app.service_layer.dispatcher import BackgroundEventDispatcher
+from app.service_layer.retry import DEFAULT_RETRY_POLICY
 
 
 class Bootstrap:
@@ -9,29 +15,60 @@ class Bootstrap:
         self,
         start_orm: bool = False,
         uow: unit_of_work.AbstractUnitOfWork = unit_of_work.SqlAlchemyUnitOfWork(),
+        concurrent_events: bool = False,
+        max_concurrent_handlers: int = 10,
+        event_dispatcher: BackgroundEventDispatcher | None = None,
     ):
         self.start_orm: bool = start_orm
         self.uow = uow
+        self.concurrent_events = concurrent_events
+        self.max_concurrent_handlers = max_concurrent_handlers
+        self.event_dispatcher = event_dispatcher
 
     def start_mappers(self):
         if self.start_orm:
             persistent_orm.start_mappers()
 
+    def start_event_dispatcher(self):
+        if self.event_dispatcher is not None:
+            # Workers handle events inline; handing them back to the dispatcher could deadlock on a full queue.
+            self.event_dispatcher.start(self._build_messagebus(event_dispatcher=None).handle)
+
+    async def stop_event_dispatcher(self, timeout: float | None = None):
+        if self.event_dispatcher is not None:
+            await self.event_dispatcher.stop(timeout=timeout)
+
     def __call__(self):
+        return self._build_messagebus(event_dispatcher=self.event_dispatcher)
+
+    def _build_messagebus(self, event_dispatcher: BackgroundEventDispatcher | None):
         dependencies = {"uow": self.uow}
-        injected_event_handlers = {
-            event_type: [inject_dependencies(handler, dependencies) for handler in event_handlers]
-            for event_type, event_handlers in handlers.EVENT_HANDLERS.items()
-        }
+        injected_event_handlers: dict[Type[events.Event], list[Callable]] = {}
+        retry_policies: dict[Callable, AsyncRetrying] = {}
+        for event_type, event_handlers in handlers.EVENT_HANDLERS.items():
+            injected_event_handlers[event_type] = []
+            for handler in event_handlers:
+                injected_handler = inject_dependencies(handler, dependencies)
+                injected_event_handlers[event_type].append(injected_handler)
+                retry_policies[injected_handler] = handlers.RETRY_POLICIES.get(handler, DEFAULT_RETRY_POLICY).build()
         injected_command_handlers = {
             command_type: inject_dependencies(handler, dependencies)
             for command_type, handler in handlers.COMMAND_HANDLERS.items()
         }
+        injected_batch_command_handlers = {
+            command_type: inject_dependencies(handler, dependencies)
+            for command_type, handler in handlers.BATCH_COMMAND_HANDLERS.items()
+        }
 
         return messagebus.MessageBus(
             uow=self.uow,
             event_handlers=injected_event_handlers,
             command_handlers=injected_command_handlers,
+            concurrent_events=self.concurrent_events,
+            max_concurrent_handlers=self.max_concurrent_handlers,
+            retry_policies=retry_policies,
+            batch_command_handlers=injected_batch_command_handlers,
+            event_dispatcher=event_dispatcher,
         )
 
 
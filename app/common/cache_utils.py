@@ -1,8 +1,24 @@
 import asyncio
+import itertools
+import logging
+import math
+import sys
+import time
 from asyncio import iscoroutinefunction
 from collections import OrderedDict
-from datetime import datetime, timedelta
-from functools import _CacheInfo, _make_key, lru_cache, partial, wraps
+from collections.abc import Callable, Hashable, Mapping
+from functools import _make_key, partial, wraps
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Literal, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+EVICTION_POLICY = Literal["lru", "lfu", "tinylfu"]
+
+# Shared by all instances rather than owned by the value: classes, modules and functions, and SQLAlchemy's instance
+# state, which leads on to the mapper and registry (whose class registry markers raise NameError on any attribute).
+_NOT_SIZED = (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)
+_NOT_SIZED_ATTRIBUTES = frozenset({"_sa_instance_state"})
 
 
 def unpartial(fn):
@@ -25,19 +41,125 @@ def _done_callback(fut, task):
     fut.set_result(task.result())
 
 
-def _cache_invalidate(wrapped, typed, *args, **kwargs):
-    key = _make_key(args, kwargs, typed)
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+    evictions: int
+    maxbytes: int | None = None
+    currbytes: int = 0
+    rejections: int = 0
+
+
+class _Entry:
+    __slots__ = ("fut", "expires_at", "refreshing", "size")
+
+    def __init__(self, fut: asyncio.Future, expires_at: float = math.inf):
+        self.fut = fut
+        # Set once the value is there, so the TTL counts from when it was computed.
+        self.expires_at = expires_at
+        self.refreshing = False
+        # Approximate bytes held by the value, counted in `currbytes` once it is there.
+        self.size = 0
+
+
+def approximate_sizeof(obj, sample: int = 64) -> int:
+    """
+    Rough deep size of `obj` in bytes: containers, instance dicts and slots are followed, and for large containers
+    only the first `sample` items are measured and the rest is extrapolated, so sizing a big result stays cheap.
+    Objects reachable more than once are counted once; mapped models count their loaded attributes only.
+    """
+    seen: set[int] = set()
+
+    def size(obj) -> int:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None), *_NOT_SIZED)):
+            return total
+        if isinstance(obj, Mapping):
+            items = list(itertools.islice(obj.items(), sample))
+            measured = sum(size(key) + size(value) for key, value in items)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            items = list(itertools.islice(obj, sample))
+            measured = sum(size(item) for item in items)
+        else:
+            measured = 0
+            if isinstance(attributes := getattr(obj, "__dict__", None), dict):
+                seen.add(id(attributes))
+                measured += sys.getsizeof(attributes) + sum(
+                    size(key) + size(value) for key, value in attributes.items() if key not in _NOT_SIZED_ATTRIBUTES
+                )
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    measured += size(getattr(obj, slot))
+            return total + measured
+        if items and len(obj) > len(items):
+            measured = measured * len(obj) // len(items)
+        return total + measured
+
+    return size(obj)
+
+
+class _FrequencySketch:
+    """
+    Count-min sketch of how often each key was asked for, for the LFU and TinyLFU policies.
+    Counters are halved every `10 * width` increments, so keys that were popular long ago lose their weight.
+    """
+
+    # Odd 64-bit multipliers, one per row: the top bits of hash * seed index the row (Fibonacci hashing).
+    seeds = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, width: int = 1024):
+        self._bits = max(width - 1, 1).bit_length()
+        self._table = [[0] * (1 << self._bits) for _ in self.seeds]
+        self._additions = 0
+        self._sample_size = 10 << self._bits
+
+    def _indexes(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return (((h * seed) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._bits) for seed in self.seeds)
+
+    def increment(self, key):
+        for row, idx in zip(self._table, self._indexes(key)):
+            row[idx] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._table = [[count >> 1 for count in row] for row in self._table]
+            self._additions //= 2
+
+    def estimate(self, key) -> int:
+        return min(row[idx] for row, idx in zip(self._table, self._indexes(key)))
+
+
+def skip_self_key(self, *args, **kwargs):
+    # For methods whose result doesn't depend on the instance: entries are shared by all instances.
+    return _make_key(args, kwargs, False)
+
+
+def _cache_invalidate(wrapped, make_key, *args, **kwargs):
+    key = make_key(*args, **kwargs)
 
     exists = key in wrapped._cache
 
     if exists:
-        wrapped._cache.pop(key)
+        _cache_pop(wrapped, key)
 
     return exists
 
 
+def _cache_pop(wrapped, key):
+    entry = wrapped._cache.pop(key)
+    if isinstance(entry, _Entry):
+        wrapped.currbytes -= entry.size
+    return entry
+
+
 def _cache_clear(wrapped):
-    wrapped.hits = wrapped.misses = 0
+    wrapped.hits = wrapped.misses = wrapped.evictions = wrapped.rejections = 0
+    wrapped.currbytes = 0
     wrapped._cache = OrderedDict()
     wrapped.tasks = set()
 
@@ -85,12 +207,16 @@ def _close_waited(wrapped, _):
     wrapped.cache_clear()
 
 
-def _cache_info(wrapped, maxsize):
-    return _CacheInfo(
+def _cache_info(wrapped, maxsize, maxbytes=None):
+    return CacheInfo(
         wrapped.hits,
         wrapped.misses,
         maxsize,
         len(wrapped._cache),
+        wrapped.evictions,
+        maxbytes,
+        wrapped.currbytes,
+        wrapped.rejections,
     )
 
 
@@ -111,13 +237,118 @@ def _cache_miss(wrapped, key):
     __cache_touch(wrapped, key)
 
 
+def _victim(wrapped, policy, exclude):
+    # Oldest entries first; pending ones are skipped, they have no size yet and their callers wait on them.
+    candidates = (key for key, entry in wrapped._cache.items() if key != exclude and entry.fut.done())
+    if policy != "lfu":
+        return next(candidates, None)
+    # Sampled LFU: the least frequently used of the few least recently used entries.
+    sample = list(itertools.islice(candidates, 5))
+    return min(sample, key=wrapped.sketch.estimate, default=None)
+
+
+def _evict(wrapped, maxsize, maxbytes, policy, key):
+    """
+    Evicts until the cache fits its bounds again once `key` got its value.
+    Under TinyLFU `key` itself is dropped instead when it is asked for no more often than the entry it would replace,
+    and so is a value larger than `maxbytes` on its own under any policy.
+    """
+    if maxbytes is not None and wrapped._cache[key].size > maxbytes:
+        _cache_pop(wrapped, key)
+        wrapped.rejections += 1
+        return
+    while (maxsize is not None and len(wrapped._cache) > maxsize) or (
+        maxbytes is not None and wrapped.currbytes > maxbytes
+    ):
+        victim = _victim(wrapped, policy, key)
+        if victim is None:
+            return
+        if policy == "tinylfu" and wrapped.sketch.estimate(key) <= wrapped.sketch.estimate(victim):
+            _cache_pop(wrapped, key)
+            wrapped.rejections += 1
+            return
+        _cache_pop(wrapped, victim)
+        wrapped.evictions += 1
+
+
+def _measure(wrapped, sizeof, value) -> int | None:
+    try:
+        return sizeof(value)
+    except Exception:
+        # Not kept rather than kept unaccounted for, which would let the cache outgrow maxbytes.
+        logger.exception("Could not size the value of %s, not caching it", wrapped)
+        wrapped.rejections += 1
+        return None
+
+
+def _resolved(wrapped, key, entry, ttl, cache_exceptions, sizeof, bounds, fut):
+    if wrapped._cache.get(key) is not entry:
+        return
+    if fut.cancelled() or (fut.exception() is not None and not cache_exceptions):
+        # Dropped right away rather than on the next call, so failures don't hold on to their tracebacks.
+        _cache_pop(wrapped, key)
+        return
+    if ttl is not None:
+        entry.expires_at = time.monotonic() + ttl
+    if sizeof is not None and fut.exception() is None:
+        if (size := _measure(wrapped, sizeof, fut.result())) is None:
+            _cache_pop(wrapped, key)
+            return
+        entry.size = size
+        wrapped.currbytes += size
+    _evict(wrapped, *bounds, key)
+
+
+def _refreshed(wrapped, key, entry, ttl, sizeof, bounds, task):
+    entry.refreshing = False
+    if task.cancelled() or task.exception() is not None:
+        # Keep serving the stale value; the next call past its expiry tries again.
+        return
+    if wrapped._cache.get(key) is entry:
+        size = 0
+        if sizeof is not None and (size := _measure(wrapped, sizeof, task.result())) is None:
+            _cache_pop(wrapped, key)
+            return
+        fut = asyncio.get_event_loop().create_future()
+        fut.set_result(task.result())
+        _cache_pop(wrapped, key)
+        fresh = wrapped._cache[key] = _Entry(fut, time.monotonic() + ttl)
+        fresh.size = size
+        wrapped.currbytes += size
+        _evict(wrapped, *bounds, key)
+
+
+async def _bounded(semaphore, fn, *args, **kwargs):
+    async with semaphore:
+        return await fn(*args, **kwargs)
+
+
 def alru_cache(
     fn=None,
     maxsize=128,
     typed=False,
     *,
     cache_exceptions=True,
+    ttl: float | None = None,
+    stale_ttl: float = 0,
+    key: Callable[..., Hashable] | None = None,
+    maxbytes: int | None = None,
+    sizeof: Callable[[object], int] = approximate_sizeof,
+    policy: EVICTION_POLICY = "lru",
+    max_inflight: int | None = None,
 ):
+    """
+    ttl: seconds an entry stays fresh after it was computed, measured on the monotonic clock; None never expires.
+    stale_ttl: seconds past its expiry during which an entry is still returned while it is recomputed in the background.
+    key: builds the cache key from the call arguments, e.g. `skip_self_key` to share entries across instances.
+    maxbytes: bound on the summed `sizeof` of the cached values, on top of `maxsize`; a value larger than that
+        on its own is returned but not kept.
+    policy: which entry makes room, "lru" the least recently used, "lfu" the least frequently used of a few of those,
+        "tinylfu" the least recently used unless the new entry is asked for less often, in which case it isn't kept.
+    max_inflight: bound on the calls of `fn` running at once, background refreshes included; the others wait.
+    Concurrent calls for a key that is being computed wait for that one computation.
+    """
+
     def wrapper(fn):
         _origin = unpartial(fn)
 
@@ -128,6 +359,11 @@ def alru_cache(
         if hasattr(fn, "_make_unbound_method"):
             fn = fn._make_unbound_method()
 
+        make_key = key if key is not None else lambda *args, **kwargs: _make_key(args, kwargs, typed)
+        bounds = (maxsize, maxbytes, policy)
+        entry_sizeof = sizeof if maxbytes is not None else None
+        call = fn if max_inflight is None else partial(_bounded, asyncio.Semaphore(max_inflight), fn)
+
         @wraps(fn)
         async def wrapped(*fn_args, **fn_kwargs):
             if wrapped.closed:
@@ -135,45 +371,62 @@ def alru_cache(
 
             loop = asyncio.get_event_loop()
 
-            key = _make_key(fn_args, fn_kwargs, typed)
+            cache_key = make_key(*fn_args, **fn_kwargs)
+            if wrapped.sketch is not None:
+                wrapped.sketch.increment(cache_key)
 
-            fut = wrapped._cache.get(key)
+            entry = wrapped._cache.get(cache_key)
 
-            if fut is not None:
+            if entry is not None:
+                fut = entry.fut
                 if not fut.done():
-                    _cache_hit(wrapped, key)
+                    _cache_hit(wrapped, cache_key)
                     return await asyncio.shield(fut)
 
-                exc = fut._exception
+                now = time.monotonic()
 
-                if exc is None or cache_exceptions:
-                    _cache_hit(wrapped, key)
+                if now < entry.expires_at:
+                    _cache_hit(wrapped, cache_key)
                     return fut.result()
-
-                # exception here and cache_exceptions == False
-                wrapped._cache.pop(key)
+                elif now < entry.expires_at + stale_ttl:
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        task = loop.create_task(call(*fn_args, **fn_kwargs))
+                        task.add_done_callback(
+                            partial(_refreshed, wrapped, cache_key, entry, ttl, entry_sizeof, bounds)
+                        )
+                        wrapped.tasks.add(task)
+                        task.add_done_callback(wrapped.tasks.discard)
+                    _cache_hit(wrapped, cache_key)
+                    return fut.result()
+                else:
+                    _cache_pop(wrapped, cache_key)
+                    wrapped.evictions += 1
 
             fut = loop.create_future()
-            task = loop.create_task(fn(*fn_args, **fn_kwargs))
+            task = loop.create_task(call(*fn_args, **fn_kwargs))
             task.add_done_callback(partial(_done_callback, fut))
 
             wrapped.tasks.add(task)
-            task.add_done_callback(wrapped.tasks.remove)
-
-            wrapped._cache[key] = fut
+            task.add_done_callback(wrapped.tasks.discard)
 
-            if maxsize is not None and len(wrapped._cache) > maxsize:
-                wrapped._cache.popitem(last=False)
+            # Bounds are enforced once the value is there: pending entries hold nothing yet and have to stay
+            # in the cache for concurrent callers to find them.
+            entry = wrapped._cache[cache_key] = _Entry(fut)
+            fut.add_done_callback(
+                partial(_resolved, wrapped, cache_key, entry, ttl, cache_exceptions, entry_sizeof, bounds)
+            )
 
-            _cache_miss(wrapped, key)
+            _cache_miss(wrapped, cache_key)
             return await asyncio.shield(fut)
 
         _cache_clear(wrapped)
         wrapped._origin = _origin
         wrapped.closed = False
-        wrapped.cache_info = partial(_cache_info, wrapped, maxsize)
+        wrapped.sketch = _FrequencySketch(max(maxsize or 1024, 256)) if policy != "lru" else None
+        wrapped.cache_info = partial(_cache_info, wrapped, maxsize, maxbytes)
         wrapped.cache_clear = partial(_cache_clear, wrapped)
-        wrapped.invalidate = partial(_cache_invalidate, wrapped, typed)
+        wrapped.invalidate = partial(_cache_invalidate, wrapped, make_key)
         wrapped.close = partial(_close, wrapped)
         wrapped.open = partial(_open, wrapped)
 
@@ -188,28 +441,82 @@ def alru_cache(
     raise NotImplementedError("{} decorating is not supported".format(fn))
 
 
-def timed_lru_cache(seconds: int, maxsize: int = 128):
-    def wrapper_cache(func):
-        if not iscoroutinefunction(func):
-            func = lru_cache(maxsize=maxsize)(func)
-            func.lifetime = timedelta(seconds=seconds)
-            func.expiration = datetime.utcnow() + func.lifetime
-            func.cache_clear = func.cache_clear
-            func.cache_info = func.cache_info
+def ttl_lru_cache(
+    fn=None,
+    maxsize=128,
+    typed=False,
+    *,
+    ttl: float | None = None,
+    key: Callable[..., Hashable] | None = None,
+):
+    """
+    Synchronous counterpart of `alru_cache` with a per-entry ttl.
+    """
 
-        else:
-            func = alru_cache(fn=func, maxsize=maxsize)
-            func.lifetime = timedelta(seconds=seconds)
-            func.expiration = datetime.utcnow() + func.lifetime
+    def wrapper(fn):
+        make_key = key if key is not None else lambda *args, **kwargs: _make_key(args, kwargs, typed)
 
-        @wraps(func)
-        def wrapped_func(*args, **kwargs):
-            if datetime.utcnow() >= func.expiration:
-                func.cache_clear()
-                func.expiration = datetime.utcnow() + func.lifetime
+        @wraps(fn)
+        def wrapped(*fn_args, **fn_kwargs):
+            cache_key = make_key(*fn_args, **fn_kwargs)
+
+            entry = wrapped._cache.get(cache_key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    _cache_hit(wrapped, cache_key)
+                    return value
+                wrapped._cache.pop(cache_key)
+                wrapped.evictions += 1
+
+            value = fn(*fn_args, **fn_kwargs)
+            wrapped._cache[cache_key] = (value, math.inf if ttl is None else time.monotonic() + ttl)
+            if maxsize is not None and len(wrapped._cache) > maxsize:
+                wrapped._cache.popitem(last=False)
+                wrapped.evictions += 1
 
-            return func(*args, **kwargs)
+            _cache_miss(wrapped, cache_key)
+            return value
 
-        return wrapped_func
+        _cache_clear(wrapped)
+        wrapped.cache_info = partial(_cache_info, wrapped, maxsize)
+        wrapped.cache_clear = partial(_cache_clear, wrapped)
+        wrapped.invalidate = partial(_cache_invalidate, wrapped, make_key)
+
+        return wrapped
+
+    if fn is None:
+        return wrapper
+
+    return wrapper(fn)
+
+
+def timed_lru_cache(
+    seconds: float,
+    maxsize: int = 128,
+    stale_seconds: float = 0,
+    key: Callable[..., Hashable] | None = None,
+    maxbytes: int | None = None,
+    policy: EVICTION_POLICY = "lru",
+    max_inflight: int | None = None,
+):
+    """
+    Every entry expires `seconds` after it was computed, rather than the whole cache at once.
+    `stale_seconds`, `maxbytes`, `policy` and `max_inflight` only apply to coroutine functions, see `alru_cache`.
+    """
+
+    def wrapper_cache(func):
+        if iscoroutinefunction(func):
+            return alru_cache(
+                fn=func,
+                maxsize=maxsize,
+                ttl=seconds,
+                stale_ttl=stale_seconds,
+                key=key,
+                maxbytes=maxbytes,
+                policy=policy,
+                max_inflight=max_inflight,
+            )
+        return ttl_lru_cache(fn=func, maxsize=maxsize, ttl=seconds, key=key)
 
     return wrapper_cache
@@ -0,0 +1,44 @@
+import base64
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+# JSON-safe [tag, value] pairs for the column values JSON has no type of its own for, so that they decode back to
+# what was encoded. Used instead of pickle for whatever is read back from outside the process: decoding runs no code.
+
+
+def encode_value(value) -> list:
+    match value:
+        case datetime():
+            return ["dt", value.isoformat()]
+        case date():
+            return ["d", value.isoformat()]
+        case time():
+            return ["t", value.isoformat()]
+        case UUID():
+            return ["uuid", str(value)]
+        case Decimal():
+            return ["dec", str(value)]
+        case bytes():
+            return ["b", base64.b64encode(value).decode()]
+        case _:
+            return ["raw", value]
+
+
+def decode_value(tagged):
+    tag, value = tagged
+    match tag:
+        case "dt":
+            return datetime.fromisoformat(value)
+        case "d":
+            return date.fromisoformat(value)
+        case "t":
+            return time.fromisoformat(value)
+        case "uuid":
+            return UUID(value)
+        case "dec":
+            return Decimal(value)
+        case "b":
+            return base64.b64decode(value)
+        case _:
+            return value
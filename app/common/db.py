@@ -2,31 +2,110 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engin
 from sqlalchemy.orm import sessionmaker
 
 from app import config
+from app.common.pool_metrics import PoolMetrics, PoolStats
+from app.common.replicas import ReplicaRouter
 
-engine: AsyncEngine | None = None
-autocommit_engine: AsyncEngine | None = None
+# Built by `init_engines` on first use (or in the startup hook) rather than at import,
+# so importing the app opens no sockets and pre-forking servers can fork before any connection exists.
+engine: AsyncEngine
+autocommit_engine: AsyncEngine
+replica_engines: list[AsyncEngine]
+replica_router: ReplicaRouter | None
+_LAZY_ATTRIBUTES = ("engine", "autocommit_engine", "replica_engines", "replica_router")
+_initialised = False
 
-if config.STAGE in ("testing", "ci-testing"):
-    engine = create_async_engine("sqlite+aiosqlite:///:memory:", future=True)
+# Per engine name ("primary", "replica-0", ...); the autocommit engine shares the primary's pool and metrics.
+pool_metrics: dict[str, PoolMetrics] = {}
 
-else:
+
+class LazySessionMaker(sessionmaker):
+    def __call__(self, **local_kw) -> AsyncSession:
+        if not _initialised:
+            init_engines()
+        return super().__call__(**local_kw)
+
+
+async_transactional_session = LazySessionMaker(expire_on_commit=False, autoflush=False, class_=AsyncSession)
+async_autocommit_session = LazySessionMaker(expire_on_commit=False, class_=AsyncSession)
+
+
+def _create_pooled_engine(name: str, uri: str, **kwargs) -> AsyncEngine:
     DB_INFO = config.PERSISTENT_DB
-    DATABASE_URI = "{}://{}:{}@{}:{}/{}".format(
-        DB_INFO.POSTGRES_PROTOCOL,
-        DB_INFO.POSTGRES_USER,
-        DB_INFO.POSTGRES_PASSWORD,
-        DB_INFO.POSTGRES_SERVER,
-        DB_INFO.POSTGRES_PORT,
-        DB_INFO.POSTGRES_DB,
+    metrics = pool_metrics[name] = PoolMetrics()
+    return metrics.instrument(
+        create_async_engine(
+            uri,
+            future=True,
+            poolclass=metrics.pool_class(),
+            pool_size=DB_INFO.POSTGRES_POOL_SIZE,
+            max_overflow=DB_INFO.POSTGRES_MAX_OVERFLOW,
+            pool_timeout=DB_INFO.POSTGRES_POOL_TIMEOUT,
+            pool_recycle=DB_INFO.POSTGRES_POOL_RECYCLE,
+            pool_pre_ping=DB_INFO.POSTGRES_POOL_PRE_PING,
+            **kwargs,
+        )
+    )
+
+
+def init_engines() -> None:
+    global engine, autocommit_engine, replica_engines, replica_router, _initialised
+    if _initialised:
+        return
+
+    replica_engines = []
+    if config.STAGE in ("testing", "ci-testing"):
+        engine = pool_metrics.setdefault("primary", PoolMetrics()).instrument(
+            create_async_engine("sqlite+aiosqlite:///:memory:", future=True)
+        )
+
+    else:
+        DB_INFO = config.PERSISTENT_DB
+        engine = _create_pooled_engine("primary", config.SQLALCHEMY_DATABASE_URI)
+
+        for idx, replica in enumerate(DB_INFO.POSTGRES_REPLICA_SERVERS):
+            host, _, port = replica.partition(":")
+            replica_engines.append(
+                _create_pooled_engine(
+                    f"replica-{idx}",
+                    "{}://{}:{}@{}:{}/{}".format(
+                        DB_INFO.POSTGRES_PROTOCOL,
+                        DB_INFO.POSTGRES_USER,
+                        DB_INFO.POSTGRES_PASSWORD,
+                        host,
+                        port or DB_INFO.POSTGRES_PORT,
+                        DB_INFO.POSTGRES_DB,
+                    ),
+                    execution_options={"isolation_level": "AUTOCOMMIT"},
+                )
+            )
+
+    autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+    async_transactional_session.configure(bind=engine)
+    async_autocommit_session.configure(bind=autocommit_engine)
+
+    replica_router = (
+        ReplicaRouter(
+            autocommit_engine,
+            replica_engines,
+            strategy=config.PERSISTENT_DB.POSTGRES_REPLICA_ROUTING,
+            max_lag=config.PERSISTENT_DB.POSTGRES_REPLICA_MAX_LAG,
+            check_interval=config.PERSISTENT_DB.POSTGRES_REPLICA_CHECK_INTERVAL,
+        )
+        if replica_engines
+        else None
     )
-    engine = create_async_engine(DATABASE_URI, future=True)
+    _initialised = True
 
 
-async_transactional_session = sessionmaker(engine, expire_on_commit=False, autoflush=False, class_=AsyncSession)
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
-async_autocommit_session = sessionmaker(autocommit_engine, expire_on_commit=False, class_=AsyncSession)
+def pool_stats() -> dict[str, PoolStats]:
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
 
 
 async def session_factory():
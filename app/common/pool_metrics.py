@@ -0,0 +1,104 @@
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass
+class PoolStats:
+    size: int | None
+    in_use: int
+    idle: int | None
+    overflow: int | None
+    checkouts: int
+    checkout_timeouts: int
+    wait_avg: float
+    wait_max: float
+    connects: int
+    closes: int
+    invalidations: int
+
+
+class PoolMetrics:
+    """
+    Counters for one engine's connection pool, fed by pool events and, for the pool class returned by `pool_class`,
+    by timing how long each checkout waited for a connection.
+    Engines derived through `execution_options` share the pool, so the autocommit engine is counted along.
+    """
+
+    def __init__(self):
+        self.engine: AsyncEngine | None = None
+        self.in_use = 0
+        self.checkouts = self.checkout_timeouts = 0
+        self.wait_total = self.wait_max = 0.0
+        self.waits = 0
+        self.connects = self.closes = self.invalidations = 0
+
+    def pool_class(self) -> type:
+        # A subclass per metrics object: pools are recreated from their own class on dispose, so the binding survives.
+        return type("InstrumentedAsyncAdaptedQueuePool", (InstrumentedAsyncAdaptedQueuePool,), {"metrics": self})
+
+    def instrument(self, engine: AsyncEngine) -> AsyncEngine:
+        self.engine = engine
+        pool_events = engine.sync_engine
+        event.listen(pool_events, "connect", self._on_connect)
+        event.listen(pool_events, "close", self._on_close)
+        event.listen(pool_events, "close_detached", self._on_close)
+        event.listen(pool_events, "invalidate", self._on_invalidate)
+        event.listen(pool_events, "checkout", self._on_checkout)
+        event.listen(pool_events, "checkin", self._on_checkin)
+        return engine
+
+    def observe_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def _on_connect(self, *_):
+        self.connects += 1
+
+    def _on_close(self, *_):
+        self.closes += 1
+
+    def _on_invalidate(self, *_):
+        self.invalidations += 1
+
+    def _on_checkout(self, *_):
+        self.checkouts += 1
+        self.in_use += 1
+
+    def _on_checkin(self, *_):
+        self.in_use -= 1
+
+    def stats(self) -> PoolStats:
+        pool = self.engine.sync_engine.pool if self.engine is not None else None
+        queue_pool = pool if isinstance(pool, AsyncAdaptedQueuePool) else None
+        return PoolStats(
+            size=queue_pool.size() if queue_pool is not None else None,
+            in_use=self.in_use,
+            idle=queue_pool.checkedin() if queue_pool is not None else None,
+            overflow=queue_pool.overflow() if queue_pool is not None else None,
+            checkouts=self.checkouts,
+            checkout_timeouts=self.checkout_timeouts,
+            wait_avg=self.wait_total / self.waits if self.waits else 0.0,
+            wait_max=self.wait_max,
+            connects=self.connects,
+            closes=self.closes,
+            invalidations=self.invalidations,
+        )
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.checkout_timeouts += 1
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - started)
@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Literal
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+ROUTING_STRATEGY = Literal["round_robin", "least_outstanding"]
+
+# Seconds the replica is behind the primary; 0 once everything received has been replayed,
+# so an idle primary does not make its replicas look like they are lagging.
+POSTGRES_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: sessionmaker = field(init=False, repr=False)
+    healthy: bool = True
+    lag: float | None = None
+    outstanding: int = 0
+    served: int = 0
+
+    def __post_init__(self):
+        self.session_factory = sessionmaker(self.engine, expire_on_commit=False, class_=AsyncSession)
+
+
+class ReplicaRouter:
+    """
+    Picks the engine a read-only session runs against.
+    Replicas that fail their health check or lag more than `max_lag` seconds are ejected until they pass again;
+    when none is left, reads fall back to the primary.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        strategy: ROUTING_STRATEGY = "round_robin",
+        max_lag: float = 10.0,
+        check_interval: float = 5.0,
+        check_timeout: float = 2.0,
+        lag_query: str = POSTGRES_LAG_QUERY,
+    ):
+        self.primary = Replica("primary", primary)
+        self.replicas = [Replica(f"replica-{idx}", engine) for idx, engine in enumerate(replicas)]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.lag_query = text(lag_query)
+        self._round_robin = itertools.count()
+        self._health_task: asyncio.Task | None = None
+
+    def acquire(self) -> Replica:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            target = self.primary
+        elif self.strategy == "least_outstanding":
+            target = min(healthy, key=lambda replica: replica.outstanding)
+        else:
+            target = healthy[next(self._round_robin) % len(healthy)]
+        target.outstanding += 1
+        target.served += 1
+        return target
+
+    def release(self, replica: Replica):
+        replica.outstanding -= 1
+
+    async def check(self):
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await asyncio.wait_for(conn.scalar(self.lag_query), self.check_timeout)
+        except Exception:
+            logger.warning("Health check of %s failed", replica.name, exc_info=True)
+            replica.lag, healthy = None, False
+        else:
+            replica.lag = float(lag or 0)
+            healthy = replica.lag <= self.max_lag
+
+        if healthy != replica.healthy:
+            logger.warning("%s is %s (lag=%s)", replica.name, "back in rotation" if healthy else "ejected", replica.lag)
+        replica.healthy = healthy
+
+    def start(self):
+        if self._health_task is None and self.replicas:
+            self._health_task = asyncio.create_task(self._run_health_checks(), name="replica-health-check")
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    async def _run_health_checks(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
@@ -1,18 +1,22 @@
+import asyncio
 import os
 import sys
 import typing
 from base64 import b64encode
 from datetime import timedelta
-from typing import Literal
+from typing import Any, Callable, Literal
 
-import boto3
 from passlib.context import CryptContext
 from pydantic import BaseSettings
 
 # Env
 
+SECRET_REGION_NAME = "ap-northeast-2"
+# Local stand-in for Secrets Manager: a file holding the same string the secret does.
+SECRETS_FILE: str | None = os.getenv("SECRETS_FILE")
 
-def get_secret() -> None:
+
+def _secret_name() -> str | None:
     secret_name: str | None = None
     if STAGE == "ci-testing":
         secret_name = "ci-test/harmony/review"
@@ -22,18 +26,49 @@ def get_secret() -> None:
         secret_name = "stage/harmony/review"
     elif STAGE == "production":
         secret_name = "prod/harmony/review"
+    return secret_name
+
+
+def _apply_secret(secret: str) -> None:
+    global _secrets_loaded
+    os.environ.update(eval(secret))
+    _secrets_loaded = True
+
+
+def get_secret() -> None:
+    if SECRETS_FILE:
+        with open(SECRETS_FILE) as f:
+            return _apply_secret(f.read())
+
+    import boto3
 
-    region_name = "ap-northeast-2"
     session = boto3.session.Session()
-    client = session.client(service_name="secretsmanager", region_name=region_name)
+    client = session.client(service_name="secretsmanager", region_name=SECRET_REGION_NAME)
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = client.get_secret_value(SecretId=_secret_name())
     except Exception as e:
         raise e
     else:
         if "SecretString" in get_secret_value_response:
-            secret = get_secret_value_response["SecretString"]
-            os.environ.update(eval(secret))
+            _apply_secret(get_secret_value_response["SecretString"])
+
+
+async def load_secrets() -> None:
+    """
+    Non-blocking counterpart of `get_secret`, meant for the startup hook.
+    Does nothing once the secret is loaded, so settings resolved afterwards never hit the network.
+    """
+    if _secrets_loaded:
+        return
+    if SECRETS_FILE:
+        return await asyncio.to_thread(get_secret)
+
+    import aioboto3
+
+    async with aioboto3.Session().client(service_name="secretsmanager", region_name=SECRET_REGION_NAME) as client:
+        get_secret_value_response = await client.get_secret_value(SecretId=_secret_name())
+    if "SecretString" in get_secret_value_response:
+        _apply_secret(get_secret_value_response["SecretString"])
 
 
 STAGE = typing.cast(
@@ -41,9 +76,8 @@ STAGE = typing.cast(
     os.getenv("STAGE"),
 )
 
-
-if STAGE not in ("local", "testing", "ci-testing"):
-    get_secret()
+# The secret is loaded by `load_secrets` on startup or, at the latest, when the first lazy setting is read.
+_secrets_loaded = STAGE in ("local", "testing", "ci-testing") and not SECRETS_FILE
 
 if "pytest" in sys.modules:
     STAGE = "testing"
@@ -67,18 +101,29 @@ class PersistentDB(BaseSettings):
     POSTGRES_DB: str = ""
     POSTGRES_PORT: str = ""
     POSTGRES_PROTOCOL: str = ""
-
-
-PERSISTENT_DB = PersistentDB()
-
-SQLALCHEMY_DATABASE_URI = "{}://{}:{}@{}:{}/{}".format(
-    PERSISTENT_DB.POSTGRES_PROTOCOL,
-    PERSISTENT_DB.POSTGRES_USER,
-    PERSISTENT_DB.POSTGRES_PASSWORD,
-    PERSISTENT_DB.POSTGRES_SERVER,
-    PERSISTENT_DB.POSTGRES_PORT,
-    PERSISTENT_DB.POSTGRES_DB,
-)
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30.0
+    # Seconds after which a connection is replaced on checkout; -1 keeps connections forever.
+    POSTGRES_POOL_RECYCLE: int = -1
+    POSTGRES_POOL_PRE_PING: bool = False
+    # Read replicas as "host" or "host:port", e.g. POSTGRES_REPLICA_SERVERS='["replica-1", "replica-2:5433"]'
+    POSTGRES_REPLICA_SERVERS: list[str] = []
+    POSTGRES_REPLICA_ROUTING: Literal["round_robin", "least_outstanding"] = "round_robin"
+    POSTGRES_REPLICA_MAX_LAG: float = 10.0
+    POSTGRES_REPLICA_CHECK_INTERVAL: float = 5.0
+
+
+def _sqlalchemy_database_uri() -> str:
+    persistent_db: PersistentDB = __getattr__("PERSISTENT_DB")
+    return "{}://{}:{}@{}:{}/{}".format(
+        persistent_db.POSTGRES_PROTOCOL,
+        persistent_db.POSTGRES_USER,
+        persistent_db.POSTGRES_PASSWORD,
+        persistent_db.POSTGRES_SERVER,
+        persistent_db.POSTGRES_PORT,
+        persistent_db.POSTGRES_DB,
+    )
 
 
 class RedisSetting(BaseSettings):
@@ -88,28 +133,96 @@ class RedisSetting(BaseSettings):
 
 REDIS_SETTING = RedisSetting()
 
+
+class EventDispatcherSetting(BaseSettings):
+    BACKGROUND_EVENT_DISPATCH: bool = False
+    EVENT_DISPATCHER_WORKERS: int = 4
+    EVENT_DISPATCHER_QUEUE_SIZE: int = 1000
+    EVENT_DISPATCHER_PUT_TIMEOUT: float | None = None
+    EVENT_DISPATCHER_DRAIN_TIMEOUT: float | None = 30
+
+
+EVENT_DISPATCHER_SETTING = EventDispatcherSetting()
+
+
+class OutboxSetting(BaseSettings):
+    USE_OUTBOX: bool = False
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_POLL_INTERVAL: float = 1.0
+
+
+OUTBOX_SETTING = OutboxSetting()
+
+
+class UnitOfWorkSetting(BaseSettings):
+    # One session per MessageBus.handle call, with a savepoint per unit of work entered while handling it.
+    UOW_SCOPED_SESSION: bool = False
+
+
+UNIT_OF_WORK_SETTING = UnitOfWorkSetting()
+
+
+class QueryCacheSetting(BaseSettings):
+    # "redis" shares results between processes through REDIS_SETTING, "memory" within the process only,
+    # "local" keeps just the per-process LRU and "none" disables caching.
+    QUERY_CACHE_BACKEND: Literal["none", "local", "memory", "redis"] = "none"
+    QUERY_CACHE_TTL: float = 60.0
+    QUERY_CACHE_L1_SIZE: int = 1024
+    QUERY_CACHE_L1_TTL: float = 5.0
+    # Where the rows changed by a commit are published for caches to invalidate: "unix" also reaches the other
+    # processes of the host through datagram sockets in INVALIDATION_SOCKET_DIR, "local" only this one.
+    INVALIDATION_TRANSPORT: Literal["none", "local", "unix"] = "none"
+    INVALIDATION_SOCKET_DIR: str = "/tmp/review-invalidation"
+
+
+QUERY_CACHE_SETTING = QueryCacheSetting()
+
 BACKEND_CORS_ORIGINS = eval(os.getenv("BACKEND_CORS_ORIGINS", "['*']"))
 API_V1_STR: str = "/api/v1"
 # Temporary login
 INTERNAL_AUTH_SERVICE_URL = os.getenv("INTERNAL_AUTH_SERVICE_URL", "http://auth-api")
 API_V1_TOKEN_URL: str = os.getenv("API_V1_TOKEN_URL", "")
 
-SECRET_KEY: str = os.getenv("SECRET_KEY", "")
-JWT_AUTH = {
-    "SECRET_KEY": b64encode(SECRET_KEY.encode()).decode(),
-    "PUBLIC_KEY": None,
-    "PRIVATE_KEY": None,
-    "ALGORITHM": "HS256",
-    "AUTHORIZATION_TYPE": "Bearer",
-    "VERIFY": True,
-    "VERIFY_EXPIRATION": True,
-    "EXPIRATION_DELTA": timedelta(minutes=30),
-    "REFRESH_EXPIRATION_DELTA": timedelta(days=15),
-    "ALLOW_REFRESH": True,
-}
+
+def _jwt_auth() -> dict:
+    return {
+        "SECRET_KEY": b64encode(__getattr__("SECRET_KEY").encode()).decode(),
+        "PUBLIC_KEY": None,
+        "PRIVATE_KEY": None,
+        "ALGORITHM": "HS256",
+        "AUTHORIZATION_TYPE": "Bearer",
+        "VERIFY": True,
+        "VERIFY_EXPIRATION": True,
+        "EXPIRATION_DELTA": timedelta(minutes=30),
+        "REFRESH_EXPIRATION_DELTA": timedelta(days=15),
+        "ALLOW_REFRESH": True,
+    }
+
+
 TZ: str = os.getenv("TZ", "UTC")
 PWD_CTX = CryptContext(schemes="bcrypt")
 
 
+# Settings that come out of the secret. They are built on first access and then cached as module attributes.
+_LAZY_SETTINGS: dict[str, Callable[[], Any]] = {
+    "PERSISTENT_DB": PersistentDB,
+    "SQLALCHEMY_DATABASE_URI": _sqlalchemy_database_uri,
+    "SECRET_KEY": lambda: os.getenv("SECRET_KEY", ""),
+    "JWT_AUTH": _jwt_auth,
+}
+
+
+def __getattr__(name: str):
+    try:
+        factory = _LAZY_SETTINGS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if not _secrets_loaded:
+        get_secret()
+    value = globals()[name] = factory()
+    return value
+
+
 def verify_unsigned_secret_key(plain_password: str, hashed_password: str) -> bool:
     return PWD_CTX.verify(plain_password, hashed_password)
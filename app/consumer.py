@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import time
+from dataclasses import dataclass
+
+from app import config as settings
+from app.adapters.invalidation import build_invalidation_bus
+from app.adapters.query_cache import build_query_cache
+from app.bootstrap import Bootstrap
+from app.common import db
+from app.service_layer.event_sources import AbstractEventSource, OutboxEventSource
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkerStats:
+    worker: int
+    processed: int
+    failed: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def run_worker(source: AbstractEventSource, worker_index: int, worker_count: int, stop, stats_queue, stats_interval):
+    # Only the parent reacts to Ctrl-C; workers are told to stop through `stop` so they can finish their batch.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    source.bind(worker_index, worker_count)
+    if settings.STAGE not in ("testing", "ci-testing"):
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(_consume(source, stop, stats_queue, stats_interval))
+
+
+async def _consume(source: AbstractEventSource, stop, stats_queue, stats_interval):
+    query_cache = build_query_cache()
+    invalidation_bus = build_invalidation_bus()
+    if invalidation_bus is not None:
+        if query_cache is not None:
+            query_cache.subscribe(invalidation_bus)
+        await invalidation_bus.start()
+
+    bootstrap = Bootstrap(
+        start_orm=settings.STAGE not in ("testing", "ci-testing"),
+        uow=SqlAlchemyUnitOfWork(
+            use_outbox=settings.OUTBOX_SETTING.USE_OUTBOX,
+            scoped=settings.UNIT_OF_WORK_SETTING.UOW_SCOPED_SESSION,
+            query_cache=query_cache,
+            invalidation_bus=invalidation_bus,
+        ),
+    )
+    bootstrap.start_mappers()
+    messagebus = bootstrap()
+
+    started = last_report = time.monotonic()
+
+    def report():
+        stats_queue.put(WorkerStats(source.worker_index, source.processed, source.failed, time.monotonic() - started))
+
+    try:
+        while not stop.is_set():
+            await source.poll(messagebus)
+            if time.monotonic() - last_report >= stats_interval:
+                report()
+                last_report = time.monotonic()
+    finally:
+        await source.close()
+        if invalidation_bus is not None:
+            await invalidation_bus.close()
+        await db.engine.dispose()
+        report()
+
+
+class ConsumerRunner:
+    def __init__(
+        self,
+        source: AbstractEventSource,
+        workers: int | None = None,
+        stats_interval: float = 30.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.source = source
+        self.workers = workers or os.cpu_count() or 1
+        self.stats_interval = stats_interval
+        self.shutdown_timeout = shutdown_timeout
+        # spawn so that every worker builds its own engine and connection pool instead of sharing forked sockets.
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._stats_queue = self._context.Queue()
+        self.stats: dict[int, WorkerStats] = {}
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self) -> dict[int, WorkerStats]:
+        processes = [
+            self._context.Process(
+                target=run_worker,
+                args=(self.source, idx, self.workers, self._stop, self._stats_queue, self.stats_interval),
+                name=f"consumer-{idx}",
+            )
+            for idx in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        while any(process.is_alive() for process in processes) and not self._stop.is_set():
+            self._collect_stats(timeout=1.0)
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, terminating", process.name)
+                process.terminate()
+        self._collect_stats(timeout=0)
+        return self.stats
+
+    def _collect_stats(self, timeout: float):
+        while True:
+            try:
+                stats: WorkerStats = self._stats_queue.get(timeout=timeout)
+            except queue_module.Empty:
+                return
+            self.stats[stats.worker] = stats
+            logger.info(
+                "worker=%s processed=%s failed=%s throughput=%.1f/s",
+                stats.worker,
+                stats.processed,
+                stats.failed,
+                stats.throughput,
+            )
+            timeout = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume domain events from the outbox with several worker processes")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_SETTING.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_SETTING.OUTBOX_POLL_INTERVAL)
+    parser.add_argument("--stats-interval", type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    source = OutboxEventSource(
+        batch_size=args.batch_size,
+        max_attempts=settings.OUTBOX_SETTING.OUTBOX_MAX_ATTEMPTS,
+        poll_interval=args.poll_interval,
+    )
+    ConsumerRunner(source, workers=args.workers, stats_interval=args.stats_interval).run()
+
+
+if __name__ == "__main__":
+    main()
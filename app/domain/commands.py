@@ -1,2 +1,8 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
 class Command:
-    pass
+    """
+    Subclasses are declared the same way, with `@dataclass(frozen=True, slots=True)`.
+    """
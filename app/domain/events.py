@@ -1,2 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
 class Event:
-    pass
+    """
+    Subclasses are declared the same way, with `@dataclass(frozen=True, slots=True)`,
+    so that events are immutable, hashable and carry no per-instance __dict__.
+    """
+
+    @property
+    def key(self) -> int:
+        # Identity rather than equality: an aggregate that raised two equal events raised two events.
+        return id(self)
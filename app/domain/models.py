@@ -1,18 +1,71 @@
 from __future__ import annotations
 
 from collections import deque
-from collections.abc import Sequence
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass, field
 from datetime import datetime
 from uuid import UUID
 
 from sqlalchemy.orm.exc import DetachedInstanceError
 
+from app.domain.events import Event
+
+
+class EventBuffer:
+    """
+    The events an aggregate raised that weren't collected yet, in the order they were raised.
+    Appending an event that is already buffered is a no-op, so merging the buffers of two copies
+    of an aggregate costs one lookup per event.
+    """
+
+    __slots__ = ("_events", "_keys")
+
+    def __init__(self, events: Iterable[Event] = ()):
+        self._events: deque[Event] = deque()
+        self._keys: set[int] = set()
+        self.extend(events)
+
+    def append(self, event: Event):
+        if event.key in self._keys:
+            return
+        self._keys.add(event.key)
+        self._events.append(event)
+
+    def extend(self, events: Iterable[Event]):
+        for event in events:
+            self.append(event)
+
+    def popleft(self) -> Event:
+        event = self._events.popleft()
+        self._keys.discard(event.key)
+        return event
+
+    def clear(self):
+        self._events.clear()
+        self._keys.clear()
+
+    def __contains__(self, event: Event) -> bool:
+        return event.key in self._keys
+
+    def __iter__(self) -> Iterator[Event]:
+        return iter(self._events)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self._events)!r})"
+
+    def __reduce__(self):
+        # Keys are identities, so they are rebuilt from the unpickled events rather than pickled along.
+        return self.__class__, (list(self._events),)
+
 
 class Base:
     id: UUID
     create_dt: datetime
     update_dt: datetime
+    events: EventBuffer
     __repr_attrs__: Sequence[str] = ["id"]
 
     def __name__(self):
@@ -52,6 +105,6 @@ class Base:
         return model
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, eq=False)
 class ExampleModel(Base):
-    events: deque = field(default_factory=deque)
+    events: EventBuffer = field(default_factory=EventBuffer)
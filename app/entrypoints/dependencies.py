@@ -1,7 +1,34 @@
+from app import config
+from app.adapters.invalidation import build_invalidation_bus
+from app.adapters.query_cache import build_query_cache
 from app.bootstrap import Bootstrap
-from app.service_layer.unit_of_work import SqlAlchemyView
+from app.service_layer.dispatcher import BackgroundEventDispatcher
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork, SqlAlchemyView
 
-BOOTSTRAP = Bootstrap(start_orm=False)
+DISPATCHER_SETTING = config.EVENT_DISPATCHER_SETTING
+QUERY_CACHE = build_query_cache()
+INVALIDATION_BUS = build_invalidation_bus()
+if QUERY_CACHE is not None and INVALIDATION_BUS is not None:
+    QUERY_CACHE.subscribe(INVALIDATION_BUS)
+
+BOOTSTRAP = Bootstrap(
+    start_orm=False,
+    uow=SqlAlchemyUnitOfWork(
+        use_outbox=config.OUTBOX_SETTING.USE_OUTBOX,
+        scoped=config.UNIT_OF_WORK_SETTING.UOW_SCOPED_SESSION,
+        query_cache=QUERY_CACHE,
+        invalidation_bus=INVALIDATION_BUS,
+    ),
+    event_dispatcher=(
+        BackgroundEventDispatcher(
+            workers=DISPATCHER_SETTING.EVENT_DISPATCHER_WORKERS,
+            maxsize=DISPATCHER_SETTING.EVENT_DISPATCHER_QUEUE_SIZE,
+            put_timeout=DISPATCHER_SETTING.EVENT_DISPATCHER_PUT_TIMEOUT,
+        )
+        if DISPATCHER_SETTING.BACKGROUND_EVENT_DISPATCH
+        else None
+    ),
+)
 
 
 def get_messagebus():
@@ -9,4 +36,4 @@ def get_messagebus():
 
 
 def get_view():
-    return SqlAlchemyView()
+    return SqlAlchemyView(query_cache=QUERY_CACHE)
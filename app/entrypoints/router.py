@@ -1,3 +1,20 @@
+from dataclasses import asdict
+
 from fastapi import APIRouter
 
+from app.common import db
+from app.entrypoints.dependencies import BOOTSTRAP
+
 api_router = APIRouter()
+
+
+@api_router.get("/metrics/db-pool")
+async def db_pool_metrics() -> dict:
+    return {name: asdict(stats) for name, stats in db.pool_stats().items()}
+
+
+@api_router.get("/metrics/event-dispatcher")
+async def event_dispatcher_metrics() -> dict:
+    if BOOTSTRAP.event_dispatcher is None:
+        return {}
+    return asdict(BOOTSTRAP.event_dispatcher.stats())
@@ -9,7 +9,8 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from app import config as settings
-from app.entrypoints.dependencies import BOOTSTRAP
+from app.common import db
+from app.entrypoints.dependencies import BOOTSTRAP, INVALIDATION_BUS
 from app.entrypoints.exceptions import APIException, APIExceptionErrorCodes, APIExceptionTypes
 from app.entrypoints.router import api_router
 
@@ -37,6 +38,12 @@ async def api_exception_handler(request: Request, exc: APIException | HarmonyCor
     return JSONResponse(status_code=exc.status_code, content=exc.get_exception_content().dict())
 
 
+@app.on_event("startup")
+async def initialise_resources():
+    await settings.load_secrets()
+    db.init_engines()
+
+
 @app.on_event("startup")
 async def configure_database_environment():
     if settings.STAGE not in ("testing", "ci-testing"):
@@ -45,6 +52,40 @@ async def configure_database_environment():
         asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
+@app.on_event("startup")
+async def start_event_dispatcher():
+    BOOTSTRAP.start_event_dispatcher()
+
+
+@app.on_event("shutdown")
+async def drain_event_dispatcher():
+    await BOOTSTRAP.stop_event_dispatcher(timeout=settings.EVENT_DISPATCHER_SETTING.EVENT_DISPATCHER_DRAIN_TIMEOUT)
+
+
+@app.on_event("startup")
+async def start_replica_health_checks():
+    if db.replica_router is not None:
+        db.replica_router.start()
+
+
+@app.on_event("shutdown")
+async def stop_replica_health_checks():
+    if db.replica_router is not None:
+        await db.replica_router.stop()
+
+
+@app.on_event("startup")
+async def start_invalidation_bus():
+    if INVALIDATION_BUS is not None:
+        await INVALIDATION_BUS.start()
+
+
+@app.on_event("shutdown")
+async def close_invalidation_bus():
+    if INVALIDATION_BUS is not None:
+        await INVALIDATION_BUS.close()
+
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from app.domain.events import Event
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DispatcherStats:
+    queue_depth: int
+    enqueued: int
+    rejected: int
+    processed: int
+    failed: int
+    last_lag: float
+    max_lag: float
+    avg_lag: float
+
+
+class BackgroundEventDispatcher:
+    """
+    Bounded in-process queue drained by a pool of worker tasks.
+    `submit` waits while the queue is full so that producers are slowed down rather than the queue growing unbounded;
+    with `put_timeout` it gives up after that long, and the caller is to handle the event itself.
+    """
+
+    def __init__(self, workers: int = 4, maxsize: int = 1000, put_timeout: float | None = None):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self._queue: asyncio.Queue | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._handle: Callable[[Event], Awaitable] | None = None
+        self._closing = False
+
+        self.enqueued = self.rejected = self.processed = self.failed = 0
+        self.last_lag = self.max_lag = self.total_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._worker_tasks) and not self._closing
+
+    def start(self, handle: Callable[[Event], Awaitable]):
+        if self._worker_tasks:
+            raise RuntimeError("BackgroundEventDispatcher is already started")
+        self._handle = handle
+        self._closing = False
+        # Created here rather than in __init__ so the queue is bound to the running loop.
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker_tasks = [
+            asyncio.create_task(self._work(), name=f"event-dispatcher-{idx}") for idx in range(self.workers)
+        ]
+
+    async def submit(self, event: Event) -> bool:
+        """
+        Returns False when the queue stayed full for `put_timeout`, in which case the event was not queued.
+        """
+        if not self.running or self._queue is None:
+            raise RuntimeError("BackgroundEventDispatcher is not running")
+        item = (time.monotonic(), event)
+        if self.put_timeout is None:
+            await self._queue.put(item)
+        else:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning("Event dispatcher queue full for %ss, not queueing %s", self.put_timeout, event)
+                return False
+        self.enqueued += 1
+        return True
+
+    async def stop(self, timeout: float | None = None):
+        if not self._worker_tasks or self._queue is None:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Event dispatcher drain timed out, dropping %s events", self._queue.qsize())
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info("Event dispatcher stopped: %s", self.stats())
+
+    def stats(self) -> DispatcherStats:
+        return DispatcherStats(
+            queue_depth=self._queue.qsize() if self._queue is not None else 0,
+            enqueued=self.enqueued,
+            rejected=self.rejected,
+            processed=self.processed,
+            failed=self.failed,
+            last_lag=self.last_lag,
+            max_lag=self.max_lag,
+            avg_lag=self.total_lag / (self.processed + self.failed) if self.processed + self.failed else 0.0,
+        )
+
+    async def _work(self):
+        assert self._queue is not None and self._handle is not None
+        while True:
+            enqueued_at, event = await self._queue.get()
+            lag = time.monotonic() - enqueued_at
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            try:
+                await self._handle(event)
+            except Exception:
+                self.failed += 1
+                logger.exception("Exception handling event %s in background", event)
+            else:
+                self.processed += 1
+            finally:
+                self._queue.task_done()
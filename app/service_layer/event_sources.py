@@ -0,0 +1,109 @@
+import abc
+import asyncio
+import logging
+import queue as queue_module
+
+from app.adapters.outbox import partition_key
+from app.domain.events import Event
+from app.service_layer.messagebus import MessageBus
+from app.service_layer.outbox_relay import OutboxRelay
+
+logger = logging.getLogger(__name__)
+
+
+class AbstractEventSource(abc.ABC):
+    """
+    Where a consumer worker pulls its events from.
+    Sources are pickled into each worker process and bound to that worker's partition there.
+    """
+
+    worker_index: int = 0
+    worker_count: int = 1
+    processed: int = 0
+    failed: int = 0
+
+    def bind(self, worker_index: int, worker_count: int):
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.processed = self.failed = 0
+
+    @abc.abstractmethod
+    async def poll(self, messagebus: MessageBus) -> int:
+        """Handle at most one batch of events and return how many were taken."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class OutboxEventSource(AbstractEventSource):
+    def __init__(self, batch_size: int = 100, max_attempts: int = 5, poll_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._relay: OutboxRelay | None = None
+
+    def bind(self, worker_index: int, worker_count: int):
+        super().bind(worker_index, worker_count)
+        self._relay = None
+
+    async def poll(self, messagebus: MessageBus) -> int:
+        if self._relay is None:
+            self._relay = OutboxRelay(
+                messagebus,
+                batch_size=self.batch_size,
+                max_attempts=self.max_attempts,
+                poll_interval=self.poll_interval,
+                partition=(self.worker_index, self.worker_count),
+            )
+        taken = await self._relay.relay_once()
+        self.processed, self.failed = self._relay.processed, self._relay.failed
+        if not taken:
+            await asyncio.sleep(self.poll_interval)
+        return taken
+
+    def __getstate__(self):
+        # The relay holds a message bus built inside the worker; it must not travel with the source.
+        return {**self.__dict__, "_relay": None}
+
+
+class QueueEventSource(AbstractEventSource):
+    """
+    Local stand-in for a message broker: one multiprocessing queue per worker.
+    Publishers route events by aggregate id, so one aggregate's events are always consumed by the same worker, in order.
+    There is no redelivery: an event whose handlers still fail once their retry policies gave up is logged, counted
+    in `failed` and dropped. Events that must not be lost go through the outbox instead.
+    """
+
+    def __init__(self, queues: list, batch_size: int = 100, timeout: float = 1.0):
+        self.queues = queues
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def bind(self, worker_index: int, worker_count: int):
+        if worker_count != len(self.queues):
+            raise ValueError(f"QueueEventSource has {len(self.queues)} queues for {worker_count} workers")
+        super().bind(worker_index, worker_count)
+
+    def publish(self, aggregate_id, event: Event):
+        self.queues[partition_key(aggregate_id) % len(self.queues)].put(event)
+
+    async def poll(self, messagebus: MessageBus) -> int:
+        queue = self.queues[self.worker_index]
+        events = []
+        try:
+            events.append(await asyncio.get_running_loop().run_in_executor(None, queue.get, True, self.timeout))
+            while len(events) < self.batch_size:
+                events.append(queue.get_nowait())
+        except queue_module.Empty:
+            pass
+
+        for event in events:
+            try:
+                await messagebus.handle(event, raise_on_failure=True)
+            except Exception:
+                logger.exception("Exception handling event %s, dropping it", event)
+                self.failed += 1
+            else:
+                self.processed += 1
+        return len(events)
@@ -1,2 +1,13 @@
 class NotSupportedError(Exception):
     pass
+
+
+class UnitOfWorkNotEntered(Exception):
+    pass
+
+
+class EventHandlingFailed(Exception):
+    def __init__(self, failures: list[tuple[object, object]]):
+        # (event, handler) pairs, for every handler that gave up.
+        self.failures = failures
+        super().__init__(f"{len(failures)} event handler(s) failed: {failures}")
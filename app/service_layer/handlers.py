@@ -1,2 +1,9 @@
 EVENT_HANDLERS: dict = {}
 COMMAND_HANDLERS: dict = {}
+
+# Command type -> handler receiving a list of commands of that type, used by MessageBus.handle_many.
+# It is expected to handle the whole list in one unit of work and return one result per command, in order.
+BATCH_COMMAND_HANDLERS: dict = {}
+
+# Event handler -> retry.RetryPolicy. Handlers not listed here fall back to retry.DEFAULT_RETRY_POLICY.
+RETRY_POLICIES: dict = {}
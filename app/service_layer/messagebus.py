@@ -1,14 +1,18 @@
+import asyncio
 import logging
 from collections import deque
 from inspect import isawaitable
-from typing import Callable, Type
+from typing import Callable, Sequence, Type, cast
 
-from tenacity import RetryError, Retrying, stop_after_attempt, wait_exponential
+from tenacity import AsyncRetrying, RetryError
 
 from app.domain import commands, events
 from app.domain.commands import Command
 from app.domain.events import Event
 from app.service_layer import unit_of_work
+from app.service_layer.dispatcher import BackgroundEventDispatcher
+from app.service_layer.exceptions import EventHandlingFailed
+from app.service_layer.retry import DEFAULT_RETRY_POLICY
 
 logger = logging.getLogger(__name__)
 
@@ -21,22 +25,100 @@ class MessageBus:
         uow: unit_of_work.AbstractUnitOfWork,
         event_handlers: dict[Type[events.Event], list[Callable]],
         command_handlers: dict[Type[commands.Command], Callable],
+        concurrent_events: bool = False,
+        max_concurrent_handlers: int = 10,
+        retry_policies: dict[Callable, AsyncRetrying] | None = None,
+        batch_command_handlers: dict[Type[commands.Command], Callable] | None = None,
+        event_dispatcher: BackgroundEventDispatcher | None = None,
     ):
         self.uow = uow
         self.event_handlers = event_handlers
         self.command_handlers = command_handlers
+        self.batch_command_handlers = batch_command_handlers or {}
+        self.event_dispatcher = event_dispatcher
+        self.retry_policies = retry_policies or {}
+        self._default_retrying = DEFAULT_RETRY_POLICY.build()
+        self.concurrent_events = concurrent_events
+        self.max_concurrent_handlers = max_concurrent_handlers
 
     async def handle(
         self,
         message: Message,
+        raise_on_failure: bool = False,
     ):
+        """
+        Event handlers that give up are only logged, unless `raise_on_failure` is set: then all events are still
+        handled, inline rather than by the background dispatcher, and EventHandlingFailed is raised at the end,
+        for callers like the outbox relay that retry the message.
+        """
         queue: deque = deque([message])  # self.queue?
+        failures: list | None = [] if raise_on_failure else None
+        background: list[Event] = []
+        async with self.uow.scope():
+            results = await self._process(queue, failures, background)
+            if failures:
+                raise EventHandlingFailed(failures)
+        await self._dispatch(background)
+        return results
+
+    async def handle_many(
+        self,
+        commands: Sequence[Command],
+    ) -> list:
+        """
+        Commands of the same type are dispatched together to the batch handler registered for that type,
+        which handles them in a single unit of work. Types without a batch handler fall back to `handle_command`.
+        Results are returned in the order the commands were given.
+        """
+        indices_by_type: dict[Type[Command], list[int]] = {}
+        for idx, command in enumerate(commands):
+            indices_by_type.setdefault(type(command), []).append(idx)
+
+        results: list = [None] * len(commands)
+        queue: deque = deque()
+        background: list[Event] = []
+        async with self.uow.scope():
+            await self._handle_many(commands, indices_by_type, results, queue, background)
+        await self._dispatch(background)
+        return results
+
+    async def _handle_many(
+        self,
+        commands: Sequence[Command],
+        indices_by_type: dict[Type[Command], list[int]],
+        results: list,
+        queue: deque,
+        background: list[Event],
+    ):
+        for command_type, indices in indices_by_type.items():
+            if command_type in self.batch_command_handlers:
+                batch_results = await self.handle_command_batch([commands[idx] for idx in indices], queue)
+                for idx, res in zip(indices, batch_results):
+                    results[idx] = res
+            else:
+                for idx in indices:
+                    results[idx] = await self.handle_command(commands[idx], queue)
+
+        await self._process(queue, background=background)
+
+    async def _process(
+        self,
+        queue: deque,
+        failures: list | None = None,
+        background: list[Event] | None = None,
+    ):
+        """
+        Events for the background dispatcher are put in `background` rather than submitted right away,
+        so that they are only handed over once what raised them has been committed.
+        """
         results: deque = deque()
         while queue:
             message = queue.popleft()
             match message:
+                case Event() if failures is None and background is not None and self._dispatching:
+                    background.append(message)
                 case Event():
-                    await self.handle_event(message, queue)
+                    await self.handle_event(message, queue, failures)
                 case Command():
                     cmd_result = await self.handle_command(message, queue)
                     results.append(cmd_result)
@@ -44,26 +126,91 @@ class MessageBus:
                     raise Exception(f"{message} was not an Event or Command")
         return results
 
+    @property
+    def _dispatching(self) -> bool:
+        return self.event_dispatcher is not None and self.event_dispatcher.running
+
+    async def _dispatch(self, background: list[Event]):
+        dispatcher = self.event_dispatcher
+        for event in background:
+            # Stopped since the events were set aside, or full: what raised the event went through already,
+            # so rather than failing the request or losing the event, it is handled here.
+            if dispatcher is None or not dispatcher.running or not await dispatcher.submit(event):
+                async with self.uow.scope():
+                    await self._process(deque([event]))
+
     async def handle_event(
         self,
         event: Event,
         queue: deque,
+        failures: list | None = None,
     ):
-        for handler in self.event_handlers[type(event)]:
-            try:
-                for attempt in Retrying(stop=stop_after_attempt(3), wait=wait_exponential()):
-                    with attempt:
+        """
+        `failures`, when given, gets an (event, handler) pair for each handler that gave up.
+        """
+        event_handlers = self.event_handlers[type(event)]
+        # Within a scope all handlers share one session, which only one of them can use at a time; handlers run
+        # concurrently with sessions of their own could neither see the scope's writes nor wait on its row locks.
+        if self.concurrent_events and len(event_handlers) > 1 and not self.uow.in_scope():
+            succeeded = await self._handle_event_concurrently(event, event_handlers, queue)
+        else:
+            succeeded = [await self._run_event_handler(event, handler, queue) for handler in event_handlers]
+        if failures is not None:
+            failures.extend((event, handler) for handler, ok in zip(event_handlers, succeeded) if not ok)
+
+    async def _handle_event_concurrently(
+        self,
+        event: Event,
+        event_handlers: list[Callable],
+        queue: deque,
+    ) -> list[bool]:
+        semaphore = asyncio.Semaphore(self.max_concurrent_handlers)
+
+        async def run(handler: Callable) -> tuple[bool, deque]:
+            # Each handler runs in a task of its own, and so enters the unit of work with a session of its own;
+            # its events can only be collected from within that task.
+            new_events: deque = deque()
+            async with semaphore, self.uow.isolated():
+                ok = await self._run_event_handler(event, handler, new_events)
+            return ok, new_events
+
+        # Queued once all handlers are done, in the order the handlers are registered,
+        # so that it doesn't depend on which handler happened to finish first.
+        succeeded = []
+        for ok, new_events in await asyncio.gather(*(run(handler) for handler in event_handlers)):
+            succeeded.append(ok)
+            queue.extend(new_events)
+        return succeeded
+
+    async def _run_event_handler(
+        self,
+        event: Event,
+        handler: Callable,
+        queue: deque | None = None,
+    ) -> bool:
+        # copy() is typed as returning the sync base class, but copies the AsyncRetrying it is called on.
+        retrying = cast(AsyncRetrying, self.retry_policies.get(handler, self._default_retrying).copy())
+        try:
+            async for attempt in retrying:
+                # Each attempt runs in its own savepoint, so a retry only undoes what the failed attempt wrote.
+                with attempt:
+                    async with self.uow.savepoint():
                         logger.debug("handling event %s with handler %s", event, handler)
                         task = handler(message=event)
                         if isawaitable(task):
                             await task
+                    if queue is not None:
                         queue.extend(self.uow.collect_new_events())
-            except RetryError as retry_failure:
-                logger.exception(
-                    "Failed to handle event %s times, giving up!",
-                    retry_failure.last_attempt.attempt_number,
-                )
-                continue
+        except RetryError as retry_failure:
+            logger.exception(
+                "Failed to handle event %s times, giving up!",
+                retry_failure.last_attempt.attempt_number,
+            )
+        except Exception:
+            logger.exception("Failed to handle event %s with non-retryable error, giving up!", event)
+        else:
+            return True
+        return False
 
     async def handle_command(
         self,
@@ -83,3 +230,24 @@ class MessageBus:
         except Exception as e:
             logger.exception("Exception handling command %s", command)
             raise e
+
+    async def handle_command_batch(
+        self,
+        commands: list[Command],
+        queue: deque,
+    ) -> list:
+        logger.debug("handling %s commands of type %s", len(commands), type(commands[0]))
+        try:
+            handler = self.batch_command_handlers[type(commands[0])]
+            task = handler(message=commands)
+            if isawaitable(task):
+                res = await task
+            else:
+                res = task
+            if len(res) != len(commands):
+                raise Exception(f"Batch handler {handler} returned {len(res)} results for {len(commands)} commands")
+            queue.extend(self.uow.collect_new_events())
+            return res
+        except Exception as e:
+            logger.exception("Exception handling commands of type %s", type(commands[0]))
+            raise e
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.adapters import outbox
+from app.adapters.persistent_orm import outbox as outbox_table
+from app.common.db import async_transactional_session
+from app.service_layer.messagebus import MessageBus
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Polls unprocessed outbox rows in batches and dispatches them through the message bus.
+    Rows are locked with `FOR UPDATE SKIP LOCKED` so that several relays can run side by side;
+    SQLite ignores the locking clause, which is fine for the single-process test setup.
+    """
+
+    def __init__(
+        self,
+        messagebus: MessageBus,
+        session_factory=None,
+        batch_size: int = 100,
+        max_attempts: int = 5,
+        poll_interval: float = 1.0,
+        partition: tuple[int, int] | None = None,
+    ):
+        self.messagebus = messagebus
+        self.session_factory = async_transactional_session if session_factory is None else session_factory
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        # (index, count): only rows whose partition key falls into this slot are relayed,
+        # which keeps the events of one aggregate on one relay and in order.
+        self.partition = partition
+        self.processed = self.failed = 0
+
+    def _pending_query(self):
+        query = select(outbox_table).where(
+            outbox_table.c.processed_dt.is_(None), outbox_table.c.attempts < self.max_attempts
+        )
+        if self.partition is not None:
+            index, count = self.partition
+            query = query.where(outbox_table.c.partition_key % count == index)
+        return query.order_by(outbox_table.c.id).limit(self.batch_size).with_for_update(skip_locked=True)
+
+    async def relay_once(self) -> int:
+        async with self.session_factory() as session:
+            async with session.begin():
+                rows = (await session.execute(self._pending_query())).all()
+                processed, failed = [], []
+                # Aggregates with a message that failed in this batch: their later messages wait for it to go through,
+                # so that they are relayed in order. They are picked up again by the next poll, after it.
+                held_back: set[str] = set()
+                for row in rows:
+                    if row.aggregate_id in held_back:
+                        continue
+                    try:
+                        # Only marked processed once every handler succeeded; otherwise it is tried again.
+                        await self.messagebus.handle(outbox.load_event(row.payload), raise_on_failure=True)
+                    except Exception:
+                        logger.exception("Failed to relay outbox message %s", row.id)
+                        failed.append(row.id)
+                        if row.aggregate_id is not None:
+                            held_back.add(row.aggregate_id)
+                        if row.attempts + 1 >= self.max_attempts:
+                            logger.error(
+                                "Giving up on outbox message %s of aggregate %s after %s attempts, it won't be relayed",
+                                row.id,
+                                row.aggregate_id,
+                                self.max_attempts,
+                            )
+                    else:
+                        processed.append(row.id)
+
+                if processed:
+                    await session.execute(
+                        update(outbox_table)
+                        .where(outbox_table.c.id.in_(processed))
+                        .values(processed_dt=datetime.utcnow())
+                    )
+                if failed:
+                    await session.execute(
+                        update(outbox_table)
+                        .where(outbox_table.c.id.in_(failed))
+                        .values(attempts=outbox_table.c.attempts + 1)
+                    )
+        self.processed += len(processed)
+        self.failed += len(failed)
+        return len(rows)
+
+    async def run(self, stop: asyncio.Event | None = None):
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            if await self.relay_once():
+                continue
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
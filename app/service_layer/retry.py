@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Type
+
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential, wait_random
+from tenacity.wait import wait_base
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    backoff_multiplier: float = 1
+    backoff_max: float | None = None
+    jitter: float = 0
+    retry_on: tuple[Type[BaseException], ...] = (Exception,)
+
+    # Policies are frozen and hashable, so each distinct policy is only turned into a retrying object once.
+    # Callers are expected to `.copy()` the result before iterating it.
+    @lru_cache(maxsize=None)
+    def build(self) -> AsyncRetrying:
+        wait: wait_base = (
+            wait_exponential(multiplier=self.backoff_multiplier)
+            if self.backoff_max is None
+            else wait_exponential(multiplier=self.backoff_multiplier, max=self.backoff_max)
+        )
+        if self.jitter:
+            wait = wait + wait_random(0, self.jitter)
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait,
+            retry=retry_if_exception_type(self.retry_on),
+        )
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
@@ -2,23 +2,82 @@ from __future__ import annotations
 
 import abc
 import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncSessionTransaction
 
-from app.adapters.repository import AsyncSqlAlchemyRepository
+from app.adapters import outbox, persistent_orm
+from app.adapters.invalidation import InvalidationBus, pop_changed_keys
+from app.adapters.query_cache import QueryCache
+from app.adapters.repository import AsyncSqlAlchemyRepository, IdentityMap, IdentityMapSnapshot
+from app.common import db
 from app.common.db import async_autocommit_session, async_transactional_session
+from app.common.replicas import Replica, ReplicaRouter
 from app.domain.models import ExampleModel
 
-from .exceptions import NotSupportedError
+from .exceptions import NotSupportedError, UnitOfWorkNotEntered
 
 DEFAULT_ALCHEMY_TRANSACTIONAL_SESSION_FACTORY = async_transactional_session
 DEFAULT_ALCHEMY_AUTOCOMMIT_SESSION_FACTORY = async_autocommit_session
 
 
+@dataclass
+class Savepoint:
+    transaction: AsyncSessionTransaction
+    seen: IdentityMap
+    # What `seen` held when the savepoint began: the aggregates and events that came after it
+    # go with the rows when it is rolled back, so that they are neither collected nor written to the outbox.
+    snapshot: IdentityMapSnapshot
+
+    @classmethod
+    async def begin(cls, scope: SessionScope) -> Savepoint:
+        return cls(await scope.session.begin_nested(), scope.points.seen, scope.points.seen.snapshot())
+
+    async def commit(self):
+        await self.transaction.commit()
+
+    async def rollback(self):
+        if self.transaction.is_active:
+            await self.transaction.rollback()
+        self.seen.restore(self.snapshot)
+
+
+@dataclass
+class SessionScope:
+    session: AsyncSession
+    points: AsyncSqlAlchemyRepository
+    # One per nested unit of work currently entered, innermost last.
+    savepoints: list[Savepoint] = field(default_factory=list)
+
+
+# The session of the outermost unit of work entered in this context (or of SqlAlchemyUnitOfWork.scope).
+# Units of work entered while it is set run in savepoints of its transaction.
+_session_scope: ContextVar[SessionScope | None] = ContextVar("session_scope", default=None)
+
+
 class AbstractUnitOfWork(abc.ABC):
     async def __aenter__(self) -> AbstractUnitOfWork:
         return self
 
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator[None]:
+        yield
+
+    @asynccontextmanager
+    async def isolated(self) -> AsyncIterator[None]:
+        yield
+
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncIterator[None]:
+        yield
+
+    def in_scope(self) -> bool:
+        return False
+
     @abc.abstractmethod
     async def commit(self):
         pass
@@ -32,32 +91,169 @@ class AbstractUnitOfWork(abc.ABC):
 
 
 class SqlAlchemyUnitOfWork(AbstractUnitOfWork):
-    def __init__(self, session_factory=None):
+    def __init__(
+        self,
+        session_factory=None,
+        use_outbox: bool = False,
+        scoped: bool = False,
+        query_cache: QueryCache | None = None,
+        invalidation_bus: InvalidationBus | None = None,
+    ):
         self.session_factory = (
             DEFAULT_ALCHEMY_TRANSACTIONAL_SESSION_FACTORY if session_factory is None else session_factory
         )
+        # When set, pending events are written to the outbox table in the committing transaction
+        # and handed to the outbox relay instead of being collected by the message bus.
+        self.use_outbox = use_outbox
+        # When set, units of work entered inside `scope` share its session and each enter is a savepoint.
+        self.scoped = scoped
+        # Cached query results reading the tables a commit wrote to are invalidated once the commit went through.
+        self.query_cache = query_cache
+        # Gets the primary keys of the rows each commit wrote, for caches to invalidate exactly those.
+        self.invalidation_bus = invalidation_bus
+        # The session and repository this unit of work was last entered with, per task: the same instance is used
+        # by every handler, and concurrently run handlers must not commit or collect the events of one another.
+        # Still set after exiting, so that the events of the last unit of work can be collected.
+        self._current: ContextVar[SessionScope | None] = ContextVar(f"unit_of_work_{id(self)}", default=None)
+
+    @property
+    def _scope(self) -> SessionScope:
+        if (scope := self._current.get()) is None:
+            raise UnitOfWorkNotEntered(f"{type(self).__name__} was not entered in this task")
+        return scope
+
+    @property
+    def session(self) -> AsyncSession:
+        return self._scope.session
+
+    @property
+    def points(self) -> AsyncSqlAlchemyRepository:
+        return self._scope.points
 
     async def __aenter__(self):
-        self.session: AsyncSession = self.session_factory()
-        self.points = AsyncSqlAlchemyRepository(model=ExampleModel, session=self.session)
+        if (scope := _session_scope.get()) is not None:
+            # Nested: a savepoint, so that leaving it uncommitted only rolls back what was done inside.
+            self._current.set(scope)
+            scope.savepoints.append(await Savepoint.begin(scope))
+        else:
+            session = self.session_factory()
+            scope = SessionScope(session=session, points=AsyncSqlAlchemyRepository(model=ExampleModel, session=session))
+            self._current.set(scope)
+            _session_scope.set(scope)
 
         return await super().__aenter__()
 
     async def __aexit__(self, *args):
+        scope = _session_scope.get()
+        if scope is not None and scope.savepoints:
+            await scope.savepoints.pop().rollback()
+            return
+        _session_scope.set(None)
         await self.session.rollback()
         await self.session.close()
 
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator[None]:
+        """
+        One session, and so one connection, for everything handled inside: each unit of work entered here
+        runs in a savepoint of a transaction that is committed when the scope exits without an error.
+        """
+        if not self.scoped or _session_scope.get() is not None:
+            yield
+            return
+
+        session = self.session_factory()
+        token = _session_scope.set(
+            SessionScope(session=session, points=AsyncSqlAlchemyRepository(model=ExampleModel, session=session))
+        )
+        try:
+            yield
+            await session.commit()
+            await self._invalidate_cache(session)
+        finally:
+            _session_scope.reset(token)
+            await session.rollback()
+            await session.close()
+
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncIterator[None]:
+        """
+        Runs the block in a savepoint of the current transaction, rolled back if the block raises.
+        Outside of any unit of work there is no transaction to protect, and the block runs as is.
+        """
+        if (scope := _session_scope.get()) is None:
+            yield
+            return
+
+        savepoint = await Savepoint.begin(scope)
+        try:
+            yield
+        except BaseException:
+            await savepoint.rollback()
+            raise
+        if savepoint.transaction.is_active:
+            await savepoint.commit()
+
+    def in_scope(self) -> bool:
+        """
+        Whether units of work entered now share a transaction that is only committed later.
+        """
+        return _session_scope.get() is not None
+
+    @asynccontextmanager
+    async def isolated(self) -> AsyncIterator[None]:
+        # A session can't be used by several tasks at once, so concurrently run handlers open their own.
+        token = _session_scope.set(None)
+        try:
+            yield
+        finally:
+            _session_scope.reset(token)
+
     async def commit(self):
         await self._commit()
 
     async def _commit(self):
+        if self.use_outbox:
+            # Flushed first, so that aggregates added in this unit of work have their primary key for the outbox rows.
+            await self.session.flush()
+            await self._write_outbox()
+        scope = _session_scope.get()
+        if scope is not None and scope.savepoints:
+            # Releases the savepoint; the rest of the block runs in a fresh one so that, as with a session of its own,
+            # anything left uncommitted is rolled back on exit.
+            await scope.savepoints.pop().commit()
+            scope.savepoints.append(await Savepoint.begin(scope))
+            return
         await self.session.commit()
+        await self._invalidate_cache(self.session)
+
+    async def _invalidate_cache(self, session: AsyncSession):
+        changes = pop_changed_keys(session.sync_session)
+        tables = {table for change in changes for table in change.tables}
+        if self.query_cache is not None and tables:
+            await self.query_cache.invalidate(tables)
+        if self.invalidation_bus is not None:
+            await self.invalidation_bus.publish(changes)
+
+    async def _write_outbox(self):
+        rows = []
+        for aggregate in self.points.seen:
+            while aggregate.events:
+                rows.append(outbox.to_row(aggregate, aggregate.events.popleft()))
+        if rows:
+            await self.session.execute(insert(persistent_orm.outbox), rows)
 
     async def rollback(self):
         await self._rollback()
 
     async def _rollback(self):
+        scope = _session_scope.get()
+        if scope is not None and scope.savepoints:
+            await scope.savepoints.pop().rollback()
+            scope.savepoints.append(await Savepoint.begin(scope))
+            return
         await self.session.rollback()
+        pop_changed_keys(self.session.sync_session)
 
     async def refresh(self, object):
         await self._refresh(object)
@@ -69,26 +265,47 @@ class SqlAlchemyUnitOfWork(AbstractUnitOfWork):
         await self.session.flush()
 
     def collect_new_events(self):
-        for review in self.reviews.seen:
-            while review.events:
-                yield review.events.popleft()
+        if self._current.get() is None:
+            return
+        for aggregate in self.points.seen:
+            while aggregate.events:
+                yield aggregate.events.popleft()
 
 
 class SqlAlchemyView(AbstractUnitOfWork):
-    def __init__(self, session_factory=None):
+    def __init__(
+        self,
+        session_factory=None,
+        router: ReplicaRouter | None = None,
+        query_cache: QueryCache | None = None,
+    ):
         self.session_factory = (
             DEFAULT_ALCHEMY_AUTOCOMMIT_SESSION_FACTORY if session_factory is None else session_factory
         )
+        self.query_cache = query_cache
+        # With read replicas configured, sessions are opened on the replica the router picks
+        # unless a session factory is given explicitly.
+        self.router = db.replica_router if router is None and session_factory is None else router
+        self.replica: Replica | None = None
 
     async def __aenter__(self):
-        self.session: AsyncSession = self.session_factory()
-        self.points = AsyncSqlAlchemyRepository(model=ExampleModel, session=self.session)
+        if self.router is not None:
+            self.replica = self.router.acquire()
+            self.session: AsyncSession = self.replica.session_factory()
+        else:
+            self.session = self.session_factory()
+        self.points = AsyncSqlAlchemyRepository(model=ExampleModel, session=self.session, query_cache=self.query_cache)
 
         return await super().__aenter__()
 
     async def __aexit__(self, *args):
-        await self.session.rollback()
-        await self.session.close()
+        try:
+            await self.session.rollback()
+            await self.session.close()
+        finally:
+            if self.replica is not None:
+                self.router.release(self.replica)
+                self.replica = None
 
     async def commit(self):
         await asyncio.sleep(0)
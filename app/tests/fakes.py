@@ -2,13 +2,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.adapters.repository import AsyncSqlAlchemyRepository
 from app.domain.models import ExampleModel
-from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork, SqlAlchemyView
+from app.service_layer.unit_of_work import SessionScope, SqlAlchemyUnitOfWork, SqlAlchemyView
 
 
 class FakeSqlAlchemyUnitOfWork(SqlAlchemyUnitOfWork):
     async def __aenter__(self):
-        self.session: AsyncSession = self.session_factory
-        self.point_units = AsyncSqlAlchemyRepository(model=ExampleModel, session=self.session)
+        session: AsyncSession = self.session_factory
+        self._current.set(
+            SessionScope(session=session, points=AsyncSqlAlchemyRepository(model=ExampleModel, session=session))
+        )
         # TODO Fake it whatever
 
         return self
@@ -27,3 +29,41 @@ class FakeSqlAlchemyView(SqlAlchemyView):
     async def __aexit__(self, *args):
         await self.session.rollback()
         await self.session.close()
+
+
+class FakeTransaction:
+    is_active = True
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeSyncSession:
+    def __init__(self):
+        self.info = {}
+
+
+class FakeSession:
+    def __init__(self, name: str):
+        self.name = name
+        self.commits = self.closes = 0
+        self.added: list = []
+        self.sync_session = FakeSyncSession()
+
+    def add(self, model):
+        self.added.append(model)
+
+    async def begin_nested(self):
+        return FakeTransaction()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        self.closes += 1
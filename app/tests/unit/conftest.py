@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import Column, DateTime, Integer, String, Table, text
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.exc import UnmappedClassError
+
+from app.adapters import in_memory_orm
+from app.common import db
+from app.domain import models
+
+
+def _map_example_model():
+    try:
+        class_mapper(models.ExampleModel)
+        return
+    except UnmappedClassError:
+        pass
+    table = Table(
+        "example",
+        in_memory_orm.metadata,
+        Column("id", String(36), primary_key=True, default=lambda: str(uuid.uuid4())),
+        Column("name", String(50)),
+        Column("amount", Integer),
+        Column("create_dt", DateTime, default=datetime.utcnow),
+        Column("update_dt", DateTime, server_default=text("CURRENT_TIMESTAMP")),
+    )
+    in_memory_orm.mapper_registry.map_imperatively(models.ExampleModel, table)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mappers():
+    _map_example_model()
+
+
+@pytest_asyncio.fixture
+async def engine():
+    async with db.engine.begin() as conn:
+        await conn.run_sync(in_memory_orm.metadata.create_all)
+    yield db.engine
+    # The in-memory database goes away with its connection, and the connection with the event loop of the test.
+    await db.engine.dispose()
+
+
+def example(name: str = "example", amount: int = 0) -> models.ExampleModel:
+    # The columns are only known to the mapping above, not to the domain model.
+    model: Any = models.ExampleModel()
+    model.name = name
+    model.amount = amount
+    return model
@@ -0,0 +1,341 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+
+from app.common import cache_utils
+from app.common.cache_utils import alru_cache, approximate_sizeof, skip_self_key, timed_lru_cache, ttl_lru_cache
+from app.tests.unit.conftest import example
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_utils, "time", clock)
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    @alru_cache
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key * 2
+
+    assert await asyncio.gather(*(load(2) for _ in range(5))) == [4] * 5
+    assert calls == [2]
+    info = load.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (4, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_their_own_ttl(clock):
+    calls = []
+
+    @alru_cache(ttl=10)
+    async def load(key):
+        calls.append(key)
+        return len(calls)
+
+    assert await load("a") == 1
+    clock.now += 5
+    assert await load("b") == 2
+    clock.now += 6
+    # "a" is 11 seconds old, "b" only 6.
+    assert await load("a") == 3
+    assert await load("b") == 2
+    assert load.cache_info().evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_served_while_refreshed(clock):
+    release = asyncio.Event()
+    calls = 0
+
+    @alru_cache(ttl=10, stale_ttl=5)
+    async def load(key):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            await release.wait()
+        return calls
+
+    assert await load("a") == 1
+    clock.now += 12
+    assert await load("a") == 1
+    assert await load("a") == 1
+    assert len(load.tasks) == 1
+
+    release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert await load("a") == 2
+    assert calls == 2
+
+    clock.now += 20
+    release.clear()
+    # Past the stale window the caller waits for the new value.
+    task = asyncio.ensure_future(load("a"))
+    await asyncio.sleep(0)
+    assert not task.done()
+    release.set()
+    assert await task == 3
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_one_entry():
+    calls = []
+
+    @alru_cache
+    async def load(key):
+        calls.append(key)
+        return key
+
+    await load(1)
+    await load(2)
+    assert load.invalidate(1)
+    assert not load.invalidate(3)
+    await load(1)
+    await load(2)
+    assert calls == [1, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_maxsize_evicts_least_recently_used():
+    @alru_cache(maxsize=2)
+    async def load(key):
+        return key
+
+    await load(1)
+    await load(2)
+    await load(1)
+    await load(3)
+    assert load.invalidate(1)
+    assert not load.invalidate(2)
+    assert load.cache_info().evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_cached_unless_disabled():
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        raise ValueError(calls)
+
+    cached = alru_cache(fail)
+    uncached = alru_cache(fail, cache_exceptions=False)
+    for fn in (cached, cached, uncached, uncached):
+        with pytest.raises(ValueError):
+            await fn()
+    assert calls == 3
+    assert len(cached._cache) == 1
+    assert len(uncached._cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_skip_self_key_shares_entries_across_instances():
+    calls = []
+
+    class Repository:
+        @alru_cache(key=skip_self_key)
+        async def load(self, key):
+            calls.append(key)
+            return key
+
+    assert await Repository().load(1) == await Repository().load(1) == 1
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_running_tasks_and_clears():
+    @alru_cache
+    async def load(key):
+        await asyncio.sleep(0.01)
+        return key
+
+    task = asyncio.ensure_future(load(1))
+    await asyncio.sleep(0)
+    await load.close()
+    assert await task == 1
+    assert load.cache_info().currsize == 0
+    with pytest.raises(RuntimeError):
+        await load(1)
+    load.open()
+    assert await load(2) == 2
+
+
+def test_ttl_lru_cache(clock):
+    calls = []
+
+    @ttl_lru_cache(maxsize=2, ttl=10)
+    def load(key):
+        calls.append(key)
+        return key
+
+    load(1)
+    load(1)
+    clock.now += 11
+    load(1)
+    load(2)
+    load(3)
+    load(1)
+    assert calls == [1, 1, 2, 3, 1]
+    info = load.cache_info()
+    assert (info.hits, info.misses, info.currsize, info.evictions) == (1, 5, 2, 3)
+    assert load.invalidate(1)
+    assert not load.invalidate(2)
+
+
+@pytest.mark.asyncio
+async def test_timed_lru_cache_picks_the_implementation():
+    @timed_lru_cache(10)
+    def sync(key):
+        return key
+
+    @timed_lru_cache(10)
+    async def coro(key):
+        return key
+
+    assert sync(1) == 1
+    assert await coro(1) == 1
+    # Only the coroutine version has background tasks to close.
+    assert hasattr(coro, "close") and not hasattr(sync, "close")
+
+
+def _models(count: int) -> list:
+    return [example(f"name-{idx}", amount=idx) for idx in range(count)]
+
+
+def test_sizeof_of_mapped_models_counts_their_attributes_only():
+    small, large = approximate_sizeof(_models(10)), approximate_sizeof(_models(1000))
+    assert 0 < small < large
+    # Neither the instance state nor the mapper behind it is counted: roughly linear in the rows.
+    assert large < small * 150
+    assert approximate_sizeof(_models(1)[0]) < 2000
+
+
+def test_sizeof_of_declaratively_mapped_models():
+    class Declarative(declarative_base()):
+        __tablename__ = "declarative"
+        id = Column(Integer, primary_key=True)
+        name = Column(String(20))
+
+    assert 0 < approximate_sizeof([Declarative(id=idx, name="x") for idx in range(100)]) < 100_000
+
+
+@pytest.mark.asyncio
+async def test_maxbytes_bounds_lists_of_mapped_models():
+    @alru_cache(maxsize=None, maxbytes=approximate_sizeof(_models(100)) * 3)
+    async def load(key):
+        return _models(100)
+
+    for key in range(5):
+        await load(key)
+    info = load.cache_info()
+    assert 0 < info.currbytes <= info.maxbytes
+    assert info.currsize == 3
+    assert info.evictions == 2
+    # The oldest were evicted.
+    assert _keys(load) == {2, 3, 4}
+
+
+@pytest.mark.asyncio
+async def test_values_larger_than_maxbytes_are_returned_but_not_kept():
+    @alru_cache(maxbytes=1000)
+    async def load(count):
+        return list(range(count))
+
+    assert await load(1000) == list(range(1000))
+    assert await load(1) == [0]
+    info = load.cache_info()
+    assert (info.currsize, info.rejections) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_values_that_cant_be_sized_are_not_kept(caplog):
+    def sizeof(value):
+        raise NameError("broken")
+
+    calls = []
+
+    @alru_cache(maxbytes=1000, sizeof=sizeof)
+    async def load(key):
+        calls.append(key)
+        return key
+
+    assert await load(1) == 1
+    assert await load(1) == 1
+    assert calls == [1, 1]
+    info = load.cache_info()
+    assert (info.currsize, info.currbytes, info.rejections) == (0, 0, 2)
+    assert "Could not size" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_lfu_keeps_frequently_used_entries():
+    @alru_cache(maxsize=3, policy="lfu")
+    async def load(key):
+        return key
+
+    for _ in range(5):
+        await load("hot")
+    for key in range(10):
+        await load(key)
+    assert _keys(load) == {"hot", 8, 9}
+
+
+@pytest.mark.asyncio
+async def test_tinylfu_only_admits_entries_used_more_than_the_one_they_replace():
+    @alru_cache(maxsize=3, policy="tinylfu")
+    async def load(key):
+        return key
+
+    for _ in range(3):
+        for key in ("a", "b", "c"):
+            await load(key)
+    for key in range(10):
+        await load(key)
+    assert _keys(load) == {"a", "b", "c"}
+    assert load.cache_info().rejections == 10
+
+    # Asked for often enough, a new key gets in.
+    for _ in range(5):
+        await load("new")
+    assert "new" in _keys(load)
+
+
+@pytest.mark.asyncio
+async def test_max_inflight_caps_concurrent_loads():
+    running = peak = 0
+
+    @alru_cache(max_inflight=2)
+    async def load(key):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return key
+
+    assert await asyncio.gather(*(load(key) for key in range(6))) == list(range(6))
+    assert peak == 2
+    assert not load.tasks
+
+
+def _keys(cached) -> set:
+    # A single int or str argument is its own key.
+    return set(cached._cache)
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+
+import pytest
+
+from app.adapters.repository import AsyncSqlAlchemyRepository, IdentityMap
+from app.domain.events import Event
+from app.domain.models import ExampleModel
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+from app.tests.fakes import FakeSession
+from app.tests.unit.conftest import example
+
+
+@dataclass(frozen=True, slots=True)
+class Changed(Event):
+    value: int
+
+
+def test_models_added_before_their_primary_key_are_found_by_it_once_assigned():
+    seen = IdentityMap()
+    model = example()
+    assert seen.add(model) is model
+    assert seen.find(model) is model
+
+    model.id = "x"
+    copy = example()
+    copy.id = "x"
+    assert seen.find(copy) is model
+    assert seen.get(ExampleModel, "x") is model
+    assert seen.add(copy) is model
+    assert len(seen) == 1
+    assert seen.of_type(ExampleModel) == [model]
+    assert list(seen) == [model]
+
+
+def test_events_of_another_copy_are_merged_into_the_model_seen_first():
+    repository = AsyncSqlAlchemyRepository(model=ExampleModel, session=FakeSession("session"))
+    model = example()
+    model.events.append(first := Changed(1))
+    repository.add(model)
+    # Assigned by the flush.
+    model.id = "x"
+
+    copy = example()
+    copy.id = "x"
+    copy.events.append(second := Changed(2))
+    repository.add(copy)
+
+    assert list(model.events) == [first, second]
+    assert len(repository.seen) == 1
+
+
+@pytest.mark.asyncio
+async def test_a_model_read_back_after_its_flush_is_seen_once(engine):
+    uow = SqlAlchemyUnitOfWork()
+    async with uow:
+        model = example("a")
+        uow.points.add(model)
+        await uow.flush()
+        assert await uow.points.filter(id__eq=model.id).get() is model
+
+        assert len(uow.points.seen) == 1
+        assert uow.points.seen.of_type(ExampleModel) == [model]
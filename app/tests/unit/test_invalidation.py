@@ -0,0 +1,121 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.adapters.invalidation import (
+    InvalidationBus,
+    ModelChanges,
+    UnixDatagramTransport,
+    _DatagramReceiver,
+    decode_changes,
+    encode_changes,
+    invalidate_cached,
+)
+from app.adapters.query_cache import QueryCache
+from app.common.cache_utils import ttl_lru_cache
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+from app.tests.unit.conftest import example
+
+CHANGES = [ModelChanges(model="ExampleModel", tables=("example",), keys=frozenset({("a",)}))]
+
+
+def test_invalidate_cached_drops_the_changed_rows():
+    calls = []
+
+    @ttl_lru_cache
+    def load(key):
+        calls.append(key)
+        return key
+
+    load("a")
+    load("b")
+    subscriber = invalidate_cached(load, to_args=lambda key: key)
+    subscriber(CHANGES)
+    load("a")
+    load("b")
+    assert calls == ["a", "b", "a"]
+
+    subscriber([ModelChanges(model="ExampleModel", tables=("example",), keys=None)])
+    assert load.cache_info().currsize == 0
+
+
+def _worker(bus: InvalidationBus, name: str, publish: bool, barrier, received):
+    async def main():
+        bus.subscribe(lambda changes: received.put((name, os.getpid(), [change.model for change in changes])))
+        await bus.start()
+        barrier.wait(5)
+        if publish:
+            await bus.publish(CHANGES)
+        await asyncio.sleep(0.3)
+        await bus.close()
+
+    asyncio.run(main())
+
+
+def test_forked_workers_of_a_bus_built_before_the_fork_reach_each_other(tmp_path):
+    # Like entrypoints.dependencies: built at import time, in the parent of the pre-forked workers.
+    bus = InvalidationBus(UnixDatagramTransport(str(tmp_path)))
+    assert bus.transport.path is None
+
+    ctx = multiprocessing.get_context("fork")
+    barrier, received = ctx.Barrier(2), ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(bus, name, name == "publisher", barrier, received))
+        for name in ("publisher", "listener")
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+        assert worker.exitcode == 0
+
+    messages = sorted(received.get(timeout=1)[0::2] for _ in range(2))
+    assert messages == [("listener", ["ExampleModel"]), ("publisher", ["ExampleModel"])]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_changes_travel_as_json():
+    changes = [
+        ModelChanges(model="ExampleModel", tables=("example",), keys=frozenset({(uuid4(),), (datetime(2022, 1, 2),)})),
+        ModelChanges(model="Other", tables=("other", "base"), keys=None),
+    ]
+    payload = encode_changes(changes)
+    json.loads(payload)
+    assert decode_changes(payload) == changes
+
+
+@pytest.mark.parametrize("payload", [b"not json", pickle.dumps(CHANGES)], ids=["garbage", "pickle"])
+def test_datagrams_that_arent_json_changes_are_dropped(payload):
+    received = []
+    _DatagramReceiver(received.append).datagram_received(payload, None)
+    _DatagramReceiver(received.append).datagram_received(encode_changes(CHANGES), None)
+    assert received == [CHANGES]
+
+
+@pytest.mark.asyncio
+async def test_commits_invalidate_the_cached_queries_over_the_tables_they_wrote(engine):
+    cache = QueryCache()
+    published = []
+    bus = InvalidationBus()
+    bus.subscribe(published.extend)
+    calls = []
+
+    async def load():
+        calls.append(None)
+        return ["n"], [(len(calls),)]
+
+    await cache.get_or_load("q", frozenset({"example"}), load)
+    uow = SqlAlchemyUnitOfWork(query_cache=cache, invalidation_bus=bus)
+    async with uow:
+        model = example("a")
+        uow.points.add(model)
+        await uow.commit()
+
+    assert await cache.get_or_load("q", frozenset({"example"}), load) == (["n"], [(2,)])
+    assert published == [ModelChanges(model="ExampleModel", tables=("example",), keys=frozenset({(model.id,)}))]
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+MODULES = [
+    "app.bootstrap",
+    "app.consumer",
+    "app.entrypoints.dependencies",
+    "app.entrypoints.router",
+    "app.service_layer.views",
+    "app.adapters.persistent_orm",
+]
+if importlib.util.find_spec("harmony_core") is not None:
+    MODULES.append("app.main")
+
+# Imported outside of pytest, which would switch config over to the testing stage.
+SCRIPT = f"""
+import {", ".join(MODULES)}
+from app import config
+from app.common import db
+
+assert not config._secrets_loaded, "the secret was fetched on import"
+assert "PERSISTENT_DB" not in vars(config), "a setting from the secret was resolved on import"
+assert not db._initialised, "the engines were built on import"
+"""
+
+
+def test_importing_the_app_neither_fetches_the_secret_nor_builds_the_engines(tmp_path):
+    # Reading the secret at all would fail on the missing file.
+    env = {**os.environ, "STAGE": "production", "SECRETS_FILE": str(tmp_path / "missing")}
+    result = subprocess.run([sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
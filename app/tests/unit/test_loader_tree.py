@@ -0,0 +1,118 @@
+import uuid
+
+import pytest
+from sqlalchemy import Column, ForeignKey, String, Table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import relationship
+
+from app.adapters import in_memory_orm
+from app.adapters.exceptions import InvalidConditionGiven
+from app.adapters.repository import AsyncSqlAlchemyRepository, loader_tree
+from app.domain.models import Base
+
+
+class Parent(Base):
+    __childs__ = ["children"]
+    name: str
+    children: list["Child"]
+
+
+class Child(Base):
+    __parents__ = ["parent"]
+    __childs__ = ["toys"]
+    parent: Parent
+    toys: list["Toy"]
+
+
+class Toy(Base):
+    pass
+
+
+def _id_column():
+    return Column("id", String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+
+in_memory_orm.mapper_registry.map_imperatively(
+    Parent,
+    Table("loader_parent", in_memory_orm.metadata, _id_column(), Column("name", String(20))),
+    properties={"children": relationship(Child, back_populates="parent")},
+)
+in_memory_orm.mapper_registry.map_imperatively(
+    Child,
+    Table(
+        "loader_child",
+        in_memory_orm.metadata,
+        _id_column(),
+        Column("parent_id", String(36), ForeignKey("loader_parent.id")),
+    ),
+    properties={"parent": relationship(Parent, back_populates="children"), "toys": relationship(Toy)},
+)
+in_memory_orm.mapper_registry.map_imperatively(
+    Toy,
+    Table(
+        "loader_toy",
+        in_memory_orm.metadata,
+        _id_column(),
+        Column("child_id", String(36), ForeignKey("loader_child.id")),
+    ),
+)
+
+
+def test_children_are_selectin_loaded_by_default():
+    tree = loader_tree(Parent)
+    assert tree.joins == ()
+    assert len(tree.options) == 1
+    assert not tree.unique
+
+
+def test_tree_is_built_once_per_arguments():
+    assert loader_tree(Parent) is loader_tree(Parent)
+    assert loader_tree(Parent, 1) is not loader_tree(Parent)
+
+
+def test_max_depth_stops_the_walk():
+    # Only parent.children, not children.toys.
+    assert loader_tree(Parent, max_depth=1).options[0].path == (Parent.children,)
+    assert loader_tree(Parent).options[0].path == (Parent.children, Child.toys)
+
+
+def test_parents_are_joined_for_contains_eager():
+    tree = loader_tree(Child, max_depth=1)
+    assert tree.joins == (Child.parent,)
+
+
+def test_joined_collections_need_unique_results():
+    assert loader_tree(Parent, strategies=(("children", "joined"),)).unique
+    assert not loader_tree(Child, strategies=(("parent", "joined"),)).unique
+
+
+async def _seed(session: AsyncSession):
+    for idx in range(3):
+        parent = Parent()
+        parent.name = f"p{idx}"
+        for _ in range(3):
+            child = Child()
+            child.toys = []
+            parent.children.append(child)
+        session.add(parent)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_cursor_paginate_with_joined_collections(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await _seed(session)
+        repo = AsyncSqlAlchemyRepository(model=Parent, session=session)
+        page = await repo.load_relationships(strategies={"children": "joined"}).cursor_paginate(2)
+        assert len(page.items) == 2
+        assert all(len(parent.children) == 3 for parent in page.items)
+        assert page.next_cursor is not None
+
+
+@pytest.mark.asyncio
+async def test_stream_rejects_joined_collections(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await _seed(session)
+        repo = AsyncSqlAlchemyRepository(model=Parent, session=session)
+        with pytest.raises(InvalidConditionGiven):
+            repo.load_relationships(strategies={"children": "joined"}).stream(2)
@@ -0,0 +1,283 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+
+import pytest
+
+from app.domain.commands import Command
+from app.domain.events import Event
+from app.service_layer.dispatcher import BackgroundEventDispatcher
+from app.service_layer.messagebus import MessageBus
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+from app.tests.fakes import FakeSession
+from app.tests.unit.conftest import example
+
+
+@dataclass(frozen=True, slots=True)
+class Started(Event):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Done(Event):
+    handler: str
+
+
+@dataclass(frozen=True, slots=True)
+class Make(Command):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handlers_commit_their_own_session_and_keep_their_events():
+    sessions: list[FakeSession] = []
+
+    def session_factory():
+        sessions.append(FakeSession(f"session-{len(sessions)}"))
+        return sessions[-1]
+
+    uow = SqlAlchemyUnitOfWork(session_factory=session_factory)
+    entered = {}
+    done = []
+
+    def handler(name: str):
+        async def handle(message):
+            async with uow:
+                entered[name] = uow.session
+                # Let the other handler enter before this one commits.
+                await asyncio.sleep(0.01)
+                model = example(name)
+                model.events.append(Done(name))
+                uow.points.add(model)
+                assert uow.session is entered[name]
+                await uow.commit()
+
+        return handle
+
+    async def record(message):
+        done.append(message.handler)
+
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={Started: [handler("a"), handler("b")], Done: [record]},
+        command_handlers={},
+        concurrent_events=True,
+    )
+    await bus.handle(Started())
+
+    assert len(sessions) == 2
+    assert entered["a"] is not entered["b"]
+    for name in ("a", "b"):
+        session = entered[name]
+        assert session.commits == 1
+        assert session.closes == 1
+        assert [model.name for model in session.added] == [name]
+    assert done == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_events_the_dispatcher_cant_take_are_handled_inline():
+    release = asyncio.Event()
+    handled = []
+
+    async def handle(message):
+        handled.append(message)
+
+    async def blocked(event):
+        await release.wait()
+
+    dispatcher = BackgroundEventDispatcher(workers=1, maxsize=1, put_timeout=0.01)
+    dispatcher.start(blocked)
+    bus = MessageBus(
+        uow=SqlAlchemyUnitOfWork(session_factory=lambda: FakeSession("session")),
+        event_handlers={Started: [handle]},
+        command_handlers={},
+        event_dispatcher=dispatcher,
+    )
+    events = [Started() for _ in range(4)]
+    for event in events:
+        await bus.handle(event)
+
+    stats = dispatcher.stats()
+    # The worker holds one, the queue another; the rest couldn't be queued.
+    assert stats.enqueued == 2
+    assert stats.rejected == 2
+    assert handled == events[2:]
+
+    release.set()
+    await dispatcher.stop(timeout=1)
+    assert dispatcher.stats().processed == 2
+
+
+@pytest.mark.asyncio
+async def test_scoped_handlers_run_one_after_another_in_the_scope_session():
+    sessions: list[FakeSession] = []
+
+    def session_factory():
+        sessions.append(FakeSession(f"session-{len(sessions)}"))
+        return sessions[-1]
+
+    uow = SqlAlchemyUnitOfWork(session_factory=session_factory, scoped=True)
+    trace = []
+
+    def handler(name: str):
+        async def handle(message):
+            async with uow:
+                trace.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                uow.points.add(example(name))
+                await uow.commit()
+                trace.append(f"{name} end")
+
+        return handle
+
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={Started: [handler("a"), handler("b")]},
+        command_handlers={},
+        concurrent_events=True,
+    )
+    await bus.handle(Started())
+
+    assert trace == ["a start", "a end", "b start", "b end"]
+    assert len(sessions) == 1
+    assert [model.name for model in sessions[0].added] == ["a", "b"]
+    assert sessions[0].commits == 1
+
+
+@pytest.mark.asyncio
+async def test_events_are_handed_to_the_dispatcher_once_the_scope_committed():
+    session = FakeSession("session")
+    uow = SqlAlchemyUnitOfWork(session_factory=lambda: session, scoped=True)
+    submitted = []
+
+    async def make(message):
+        async with uow:
+            model = example("a")
+            model.events.append(Done("a"))
+            uow.points.add(model)
+            await uow.commit()
+        return "made"
+
+    class SpyDispatcher(BackgroundEventDispatcher):
+        async def submit(self, event):
+            submitted.append((event, session.commits))
+            return await super().submit(event)
+
+    handled = []
+
+    async def handle_in_background(event):
+        handled.append(event)
+
+    dispatcher = SpyDispatcher(workers=1)
+    dispatcher.start(handle_in_background)
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={},
+        command_handlers={Make: make},
+        event_dispatcher=dispatcher,
+    )
+    assert await bus.handle(Make()) == deque(["made"])
+    await dispatcher.stop(timeout=1)
+
+    assert submitted == [(Done("a"), 1)]
+    assert handled == [Done("a")]
+
+
+@pytest.mark.asyncio
+async def test_events_are_handled_inline_when_the_dispatcher_stopped_before_they_were_handed_over():
+    dispatcher = BackgroundEventDispatcher(workers=1)
+
+    class StoppingSession(FakeSession):
+        async def commit(self):
+            await super().commit()
+            # Shutting down while the request commits.
+            await dispatcher.stop(timeout=1)
+
+    uow = SqlAlchemyUnitOfWork(session_factory=lambda: StoppingSession("session"), scoped=True)
+
+    async def make(message):
+        async with uow:
+            model = example("a")
+            model.events.append(Done("a"))
+            uow.points.add(model)
+            await uow.commit()
+
+    handled = []
+
+    async def record(message):
+        handled.append(message)
+
+    async def handle_in_background(event):
+        raise AssertionError("the dispatcher is stopped")
+
+    dispatcher.start(handle_in_background)
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={Done: [record]},
+        command_handlers={Make: make},
+        event_dispatcher=dispatcher,
+    )
+    await bus.handle(Make())
+
+    assert handled == [Done("a")]
+    assert dispatcher.stats().enqueued == 0
+
+
+@dataclass(frozen=True, slots=True)
+class Add(Command):
+    value: int
+
+
+@dataclass(frozen=True, slots=True)
+class Echo(Command):
+    value: str
+
+
+@pytest.mark.asyncio
+async def test_handle_many_returns_the_results_in_command_order():
+    uow = SqlAlchemyUnitOfWork(session_factory=lambda: FakeSession("session"))
+    batches = []
+    done = []
+
+    async def add(message):
+        batches.append([command.value for command in message])
+        async with uow:
+            for command in message:
+                model = example(str(command.value))
+                model.events.append(Done(str(command.value)))
+                uow.points.add(model)
+            await uow.commit()
+        return [command.value * 10 for command in message]
+
+    async def echo(message):
+        return message.value
+
+    async def record(message):
+        done.append(message.handler)
+
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={Done: [record]},
+        command_handlers={Echo: echo},
+        batch_command_handlers={Add: add},
+    )
+    assert await bus.handle_many([Add(1), Echo("a"), Add(2), Echo("b"), Add(3)]) == [10, "a", 20, "b", 30]
+    # One call for all the commands of a batched type, in the order they were given.
+    assert batches == [[1, 2, 3]]
+    assert done == ["1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_a_batch_handler_must_return_a_result_per_command():
+    async def add(message):
+        return [None]
+
+    bus = MessageBus(
+        uow=SqlAlchemyUnitOfWork(session_factory=lambda: FakeSession("session")),
+        event_handlers={},
+        command_handlers={},
+        batch_command_handlers={Add: add},
+    )
+    with pytest.raises(Exception, match="returned 1 results for 2 commands"):
+        await bus.handle_many([Add(1), Add(2)])
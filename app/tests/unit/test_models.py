@@ -0,0 +1,55 @@
+import pickle
+from dataclasses import FrozenInstanceError, dataclass
+
+import pytest
+
+from app.domain.commands import Command
+from app.domain.events import Event
+from app.domain.models import EventBuffer
+
+
+@dataclass(frozen=True, slots=True)
+class Moved(Event):
+    to: int
+
+
+@dataclass(frozen=True, slots=True)
+class Move(Command):
+    to: int
+
+
+def test_messages_are_frozen_slotted_and_hashable():
+    event = Moved(1)
+    assert not hasattr(event, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        event.to = 2
+    assert hash(event) == hash(Moved(1))
+    assert pickle.loads(pickle.dumps(Move(1))) == Move(1)
+
+
+def test_event_buffer_keeps_order_and_drops_repeated_events():
+    first, second = Moved(1), Moved(1)
+    buffer = EventBuffer([first, second])
+    buffer.append(first)
+    buffer.extend([Moved(2), second])
+    # Equal events are still distinct events, only the same one is dropped.
+    assert list(buffer) == [first, second, Moved(2)]
+    assert len(buffer) == 3
+    assert first in buffer and Moved(1) not in buffer
+
+    assert buffer.popleft() is first
+    assert first not in buffer
+    buffer.append(first)
+    assert list(buffer) == [second, Moved(2), first]
+
+    buffer.clear()
+    assert not buffer
+
+
+def test_event_buffer_survives_pickling():
+    buffer = pickle.loads(pickle.dumps(EventBuffer([Moved(1), Moved(2)])))
+    assert list(buffer) == [Moved(1), Moved(2)]
+    assert all(event in buffer for event in buffer)
+    event = buffer.popleft()
+    buffer.append(event)
+    assert len(buffer) == 2
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.adapters import outbox
+from app.adapters.persistent_orm import outbox as outbox_table
+from app.domain.events import Event
+from app.service_layer.messagebus import MessageBus
+from app.service_layer.outbox_relay import OutboxRelay
+from app.service_layer.retry import RetryPolicy
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+from app.tests.unit.conftest import example
+
+
+@dataclass(frozen=True, slots=True)
+class Relayed(Event):
+    value: int
+
+
+@pytest.mark.asyncio
+async def test_events_of_added_aggregates_are_written_with_their_id(engine):
+    uow = SqlAlchemyUnitOfWork(use_outbox=True)
+    async with uow:
+        model = example("a")
+        model.events.append(Relayed(1))
+        uow.points.add(model)
+        await uow.commit()
+
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(outbox_table))).one()
+    assert model.id is not None
+    assert (row.aggregate_id, row.partition_key) == (model.id, outbox.partition_key(model.id))
+    assert outbox.load_event(row.payload) == Relayed(1)
+
+
+@pytest.mark.asyncio
+async def test_rows_whose_handlers_failed_are_retried_not_marked_processed(engine):
+    fail = True
+    handled = []
+
+    async def handler(message):
+        if fail:
+            raise ValueError(message)
+        handled.append(message)
+
+    bus = MessageBus(
+        uow=SqlAlchemyUnitOfWork(),
+        event_handlers={Relayed: [handler]},
+        command_handlers={},
+        retry_policies={handler: RetryPolicy(max_attempts=1).build()},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(insert(outbox_table), [outbox.to_row(None, Relayed(1))])
+
+    relay = OutboxRelay(bus, max_attempts=3)
+    assert await relay.relay_once() == 1
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(outbox_table))).one()
+    assert (row.processed_dt, row.attempts, relay.failed) == (None, 1, 1)
+
+    fail = False
+    assert await relay.relay_once() == 1
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(outbox_table))).one()
+    assert row.processed_dt is not None
+    assert row.attempts == 1
+    assert handled == [Relayed(1)]
+    assert relay.processed == 1
+
+
+@pytest.mark.asyncio
+async def test_later_messages_of_an_aggregate_wait_for_one_that_failed(engine, caplog):
+    failing = {Relayed(1)}
+    handled = []
+
+    async def handler(message):
+        if message in failing:
+            raise ValueError(message)
+        handled.append(message.value)
+
+    bus = MessageBus(
+        uow=SqlAlchemyUnitOfWork(),
+        event_handlers={Relayed: [handler]},
+        command_handlers={},
+        retry_policies={handler: RetryPolicy(max_attempts=1).build()},
+    )
+    a, b = SimpleNamespace(id="a"), SimpleNamespace(id="b")
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(outbox_table),
+            [outbox.to_row(a, Relayed(1)), outbox.to_row(a, Relayed(2)), outbox.to_row(b, Relayed(3))],
+        )
+
+    relay = OutboxRelay(bus, max_attempts=2)
+    await relay.relay_once()
+    assert handled == [3]
+    async with engine.connect() as conn:
+        attempts = (await conn.execute(select(outbox_table.c.attempts).order_by(outbox_table.c.id))).scalars().all()
+    assert attempts == [1, 0, 0]
+
+    # Still failing on its last attempt: given up on, which lets the next message of the aggregate through.
+    await relay.relay_once()
+    assert handled == [3]
+    assert "Giving up on outbox message 1 of aggregate a after 2 attempts" in caplog.text
+    await relay.relay_once()
+    assert handled == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_messages_held_back_are_relayed_in_order_once_the_failed_one_goes_through(engine):
+    fail = True
+    handled = []
+
+    async def handler(message):
+        if fail and message == Relayed(1):
+            raise ValueError(message)
+        handled.append(message.value)
+
+    bus = MessageBus(
+        uow=SqlAlchemyUnitOfWork(),
+        event_handlers={Relayed: [handler]},
+        command_handlers={},
+        retry_policies={handler: RetryPolicy(max_attempts=1).build()},
+    )
+    a = SimpleNamespace(id="a")
+    async with engine.begin() as conn:
+        await conn.execute(insert(outbox_table), [outbox.to_row(a, Relayed(value)) for value in (1, 2, 3)])
+
+    relay = OutboxRelay(bus, max_attempts=3)
+    await relay.relay_once()
+    assert handled == []
+    fail = False
+    await relay.relay_once()
+    assert handled == [1, 2, 3]
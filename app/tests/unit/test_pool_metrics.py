@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.common.pool_metrics import PoolMetrics
+
+
+@pytest.mark.asyncio
+async def test_checkouts_waits_and_timeouts_are_counted(tmp_path):
+    metrics = PoolMetrics()
+    engine = metrics.instrument(
+        create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=metrics.pool_class(),
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+    )
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        stats = metrics.stats()
+        assert (stats.size, stats.in_use, stats.idle, stats.overflow) == (1, 1, 0, 0)
+        with pytest.raises(exc.TimeoutError):
+            await engine.connect().start()
+
+    async with engine.connect() as conn:
+        await conn.invalidate()
+    # The invalidated connection is replaced on its next checkout.
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    stats = metrics.stats()
+    assert (stats.in_use, stats.checkouts, stats.checkout_timeouts) == (0, 3, 1)
+    assert (stats.connects, stats.invalidations) == (2, 1)
+    assert stats.wait_max >= 0.05 and 0 < stats.wait_avg <= stats.wait_max
+
+    await engine.dispose()
+    assert metrics.stats().closes == 2
+
+
+def test_stats_of_an_engine_not_instrumented_yet_are_empty():
+    stats = PoolMetrics().stats()
+    assert (stats.size, stats.idle, stats.overflow, stats.checkouts) == (None, None, None, 0)
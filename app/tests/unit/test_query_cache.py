@@ -0,0 +1,102 @@
+import json
+import pickle
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.adapters.query_cache import InMemoryCacheBackend, QueryCache
+
+TAGS = frozenset({"example"})
+
+
+def _loader(results: list):
+    calls = []
+
+    async def load():
+        calls.append(None)
+        return results[len(calls) - 1]
+
+    return load, calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [None, InMemoryCacheBackend()], ids=["l1-only", "l1-and-l2"])
+async def test_results_are_served_from_cache_until_invalidated(backend):
+    cache = QueryCache(backend, ttl=60, l1_ttl=60)
+    load, calls = _loader([(["n"], [(1,)]), (["n"], [(2,)])])
+
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [(1,)])
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [(1,)])
+    await cache.invalidate({"other"})
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [(1,)])
+    await cache.invalidate({"example"})
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [(2,)])
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [None, InMemoryCacheBackend()], ids=["l1-only", "l1-and-l2"])
+async def test_a_load_that_raced_a_commit_is_not_cached(backend):
+    cache = QueryCache(backend, ttl=60, l1_ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(None)
+        if len(calls) == 1:
+            # Another request commits a write to the table after this load read it.
+            await cache.invalidate({"example"})
+            return ["n"], [("stale",)]
+        return ["n"], [("fresh",)]
+
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [("stale",)])
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [("fresh",)])
+    assert await cache.get_or_load("q", TAGS, load) == (["n"], [("fresh",)])
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_a_load_that_raced_another_process_commit_is_not_stored_in_l2():
+    backend = InMemoryCacheBackend()
+    # Two processes sharing L2.
+    this, other = QueryCache(backend, ttl=60, l1_ttl=60), QueryCache(backend, ttl=60, l1_ttl=60)
+
+    async def load():
+        await other.invalidate({"example"})
+        return ["n"], [("stale",)]
+
+    await this.get_or_load("q", TAGS, load)
+    assert await backend.get("q") is None
+    assert this.l1_hits == 0
+    assert await this.get_or_load("q", TAGS, load) == (["n"], [("stale",)])
+    assert this.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_rows_are_shared_through_l2_as_tagged_json():
+    backend = InMemoryCacheBackend()
+    rows = (
+        ["a", "b", "c", "d", "e", "f", "g", "h"],
+        [(datetime(2022, 1, 2, 3, 4), date(2022, 1, 2), time(3, 4), Decimal("1.50"), uuid4(), b"\x00", 1.5, None)],
+    )
+
+    async def load():
+        return rows
+
+    await QueryCache(backend).get_or_load("q", TAGS, load)
+    json.loads(await backend.get("q"))
+    other = QueryCache(backend)
+    assert await other.get_or_load("q", TAGS, load) == rows
+    assert other.l2_hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payload", [b"not json", pickle.dumps((["n"], [(1,)]))], ids=["garbage", "pickle"])
+async def test_entries_that_arent_tagged_json_are_loaded_again(payload):
+    backend = InMemoryCacheBackend()
+    await backend.set("q", payload, 60, {})
+    load, calls = _loader([(["n"], [(2,)])])
+
+    assert await QueryCache(backend).get_or_load("q", TAGS, load) == (["n"], [(2,)])
+    assert len(calls) == 1
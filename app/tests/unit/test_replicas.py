@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.common.replicas import ReplicaRouter
+
+LAG_QUERY = "SELECT seconds FROM lag"
+
+
+async def _replica(path, lag: float | None):
+    # A file per replica, each reporting its own lag; a replica without the table fails its health check.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    if lag is not None:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE lag (seconds FLOAT)"))
+            await conn.execute(text("INSERT INTO lag VALUES (:lag)"), {"lag": lag})
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_lagging_and_failing_replicas_are_ejected_until_they_pass_again(tmp_path):
+    primary = create_async_engine("sqlite+aiosqlite://")
+    engines = [await _replica(tmp_path / f"{idx}.db", lag) for idx, lag in enumerate([0, 30, None])]
+    router = ReplicaRouter(primary, engines, max_lag=10, lag_query=LAG_QUERY)
+
+    await router.check()
+    assert [(replica.healthy, replica.lag) for replica in router.replicas] == [(True, 0), (False, 30), (False, None)]
+    assert [router.acquire().name for _ in range(3)] == ["replica-0"] * 3
+
+    async with engines[1].begin() as conn:
+        await conn.execute(text("UPDATE lag SET seconds = 1"))
+    await router.check()
+    assert sorted(router.acquire().name for _ in range(4)) == ["replica-0", "replica-0", "replica-1", "replica-1"]
+
+    for engine in [primary, *engines]:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_to_the_primary_when_no_replica_is_healthy(tmp_path):
+    primary = create_async_engine("sqlite+aiosqlite://")
+    engine = await _replica(tmp_path / "replica.db", None)
+    router = ReplicaRouter(primary, [engine], lag_query=LAG_QUERY)
+
+    await router.check()
+    replica = router.acquire()
+    assert replica is router.primary
+    assert (replica.outstanding, replica.served) == (1, 1)
+    router.release(replica)
+    assert replica.outstanding == 0
+
+    await primary.dispose()
+    await engine.dispose()
+
+
+def test_least_outstanding_picks_the_replica_with_the_fewest_reads_in_flight():
+    primary = create_async_engine("sqlite+aiosqlite://")
+    router = ReplicaRouter(primary, [create_async_engine("sqlite+aiosqlite://") for _ in range(2)], "least_outstanding")
+
+    first, second = router.acquire(), router.acquire()
+    assert (first.name, second.name) == ("replica-0", "replica-1")
+    router.release(first)
+    assert router.acquire() is first
+    assert [replica.served for replica in router.replicas] == [2, 1]
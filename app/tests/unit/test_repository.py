@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.adapters.exceptions import InvalidConditionGiven, NotSupportedDialect
+from app.adapters.repository import AsyncSqlAlchemyRepository
+from app.domain.events import Event
+from app.domain.models import ExampleModel
+from app.tests.unit.conftest import example
+
+
+@dataclass(frozen=True, slots=True)
+class Changed(Event):
+    value: int
+
+
+@pytest.mark.asyncio
+async def test_models_are_only_refreshed_when_something_has_to_be_loaded(engine):
+    async with AsyncSession(engine, expire_on_commit=False, autoflush=False) as session:
+        repo = AsyncSqlAlchemyRepository(model=ExampleModel, session=session)
+        model = example("a")
+        repo.add(model)
+        await session.flush()
+
+        # Added with server-side defaults that only a refresh reads back.
+        assert await repo.filter(id__eq=model.id).get() is model
+        assert model.update_dt is not None
+        assert (repo.refresh_stats.ran, repo.refresh_stats.skipped) == (1, 0)
+
+        await repo.filter(id__eq=model.id).get()
+        assert (repo.refresh_stats.ran, repo.refresh_stats.skipped) == (1, 1)
+
+        await repo.filter(id__eq=model.id).get(refresh=True)
+        assert (repo.refresh_stats.ran, repo.refresh_stats.skipped) == (2, 1)
+
+        # Expired attributes are loaded again by the query itself.
+        session.expire(model, ["name"])
+        await repo.filter(id__eq=model.id).get()
+        assert model.name == "a"
+        assert (repo.refresh_stats.ran, repo.refresh_stats.skipped) == (2, 2)
+
+
+async def _seed(session: AsyncSession, *rows: tuple[str, int]) -> list[ExampleModel]:
+    models = [example(name, amount) for name, amount in rows]
+    session.add_all(models)
+    await session.commit()
+    return models
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_batches_and_resets_the_query(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await _seed(session, *((f"n{idx}", idx) for idx in range(5)))
+        repo = AsyncSqlAlchemyRepository(model=ExampleModel, session=session)
+
+        stream = repo.filter(amount__gte=1).order_by("amount").stream(batch_size=2)
+        # The query was taken by stream, so the repository is free for another one before the stream is read.
+        assert len(await repo.list()) == 5
+        batches = [batch async for batch in stream]
+        assert [[model.amount for model in batch] for batch in batches] == [[1, 2], [3, 4]]
+
+        rows = [batch async for batch in repo.order_by("-amount").stream(batch_size=3, scalar=False)]
+        assert [[row[0].amount for row in batch] for batch in rows] == [[4, 3, 2], [1, 0]]
+
+
+@pytest.mark.asyncio
+async def test_bulk_add_and_upsert_round_trip(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        repo = AsyncSqlAlchemyRepository(model=ExampleModel, session=session)
+        models = [example(f"n{idx}", idx) for idx in range(3)]
+        models[0].events.append(Changed(0))
+
+        keys = await repo.bulk_add(models, chunk_size=2, return_keys=True)
+        assert keys == [model.id for model in models] and None not in keys
+        assert len(repo.seen) == 3
+        assert list(models[0].events) == [Changed(0)]
+
+        changed = example("n0-changed", 10)
+        changed.id = models[0].id
+        await repo.bulk_upsert([changed, example("n3", 3)], update_columns=["name", "amount"])
+        await session.commit()
+
+        stored = await repo.order_by("amount").list()
+        assert [(model.name, model.amount) for model in stored] == [("n1", 1), ("n2", 2), ("n3", 3), ("n0-changed", 10)]
+        assert await repo.bulk_add([]) is None
+
+
+@pytest.mark.asyncio
+async def test_values_reads_the_filtered_rows_in_each_row_format(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await _seed(session, ("a", 1), ("b", 2), ("c", 3))
+        repo = AsyncSqlAlchemyRepository(model=ExampleModel, session=session)
+
+        assert await repo.filter(amount__gte=2).order_by("amount").values("name", "amount") == [("b", 2), ("c", 3)]
+
+        rows = await repo.filter(amount__lt=3).order_by("-amount").only("name").values(row="namedtuple")
+        assert [row.name for row in rows] == ["b", "a"]
+
+        rows = await repo.filter(name__eq="c").values("name", "amount", row="dict")
+        assert rows == [{"name": "c", "amount": 3}]
+        assert len(repo.seen) == 0
+
+        with pytest.raises(InvalidConditionGiven):
+            await repo.values()
+
+
+@pytest.mark.asyncio
+async def test_several_aggregates_are_grouped_and_keep_the_filters(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await _seed(session, ("a", 1), ("a", 3), ("b", 5), ("b", 7), ("c", 100))
+        repo = AsyncSqlAlchemyRepository(model=ExampleModel, session=session)
+
+        result = await (
+            repo.filter(amount__lt=100)
+            .aggregate(total="amount__sum", rows="id__count", largest="amount__max")
+            .group_by("name")
+            .order_by("name")
+            .columns()
+        )
+        assert result == {"name": ["a", "b"], "total": [4, 12], "rows": [2, 2], "largest": [3, 7]}
+
+        assert await repo.filter(name__eq="z").aggregate(total="amount__sum").columns() == {"total": [None]}
+        assert await repo.aggregate(attribute="amount", func_name="min").columns() == {"min_amount": [1]}
+
+        with pytest.raises(NotSupportedDialect):
+            repo.aggregate(p95="amount__p95")
@@ -0,0 +1,50 @@
+import pytest
+from tenacity import RetryError
+
+from app.service_layer.retry import RetryPolicy
+
+
+def test_equal_policies_build_one_retrying_object():
+    assert RetryPolicy(max_attempts=2).build() is RetryPolicy(max_attempts=2).build()
+    assert RetryPolicy(max_attempts=2).build() is not RetryPolicy(max_attempts=3).build()
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_attempts():
+    attempts = []
+
+    async def run():
+        async for attempt in RetryPolicy(max_attempts=3, backoff_multiplier=0).build().copy():
+            with attempt:
+                attempts.append(attempt.retry_state.attempt_number)
+                raise ValueError
+
+    with pytest.raises(RetryError):
+        await run()
+    assert attempts == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_only_retries_the_given_exceptions():
+    attempts = []
+    policy = RetryPolicy(max_attempts=3, backoff_multiplier=0, retry_on=(KeyError,))
+
+    async def run(exc):
+        async for attempt in policy.build().copy():
+            with attempt:
+                attempts.append(exc)
+                raise exc
+
+    with pytest.raises(ValueError):
+        await run(ValueError)
+    assert attempts == [ValueError]
+
+
+def test_backoff_is_capped_and_jittered():
+    wait = RetryPolicy(backoff_multiplier=1, backoff_max=2, jitter=0.5).build().wait
+
+    class State:
+        attempt_number = 10
+
+    for _ in range(20):
+        assert 2 <= wait(State()) <= 2.5
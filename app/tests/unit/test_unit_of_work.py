@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+
+import pytest
+from sqlalchemy import inspect, select
+
+from app.adapters import outbox
+from app.adapters.persistent_orm import outbox as outbox_table
+from app.domain.events import Event
+from app.domain.models import ExampleModel
+from app.service_layer.exceptions import UnitOfWorkNotEntered
+from app.service_layer.messagebus import MessageBus
+from app.service_layer.retry import RetryPolicy
+from app.service_layer.unit_of_work import SqlAlchemyUnitOfWork
+from app.tests.fakes import FakeSession
+from app.tests.unit.conftest import example
+
+
+@dataclass(frozen=True, slots=True)
+class Started(Event):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Made(Event):
+    name: str
+
+
+def _made(uow: SqlAlchemyUnitOfWork, name: str) -> ExampleModel:
+    model = example(name)
+    model.events.append(Made(name))
+    uow.points.add(model)
+    return model
+
+
+async def _names(engine) -> list[str]:
+    async with engine.connect() as conn:
+        return list((await conn.execute(select(inspect(ExampleModel).local_table.c.name))).scalars())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_outbox", [False, True], ids=["collected", "outbox"])
+@pytest.mark.parametrize("committed", [False, True], ids=["uncommitted", "committed"])
+async def test_events_of_a_failed_attempt_are_rolled_back_with_its_rows(engine, use_outbox, committed):
+    uow = SqlAlchemyUnitOfWork(scoped=True, use_outbox=use_outbox)
+    attempts = []
+    dispatched = []
+
+    async def make(message):
+        async with uow:
+            attempts.append(name := f"attempt{len(attempts)}")
+            _made(uow, name)
+            if len(attempts) == 1 and not committed:
+                raise ValueError("the first attempt fails")
+            await uow.commit()
+        if len(attempts) == 1:
+            raise ValueError("the first attempt fails after its commit")
+
+    async def record(message):
+        dispatched.append(message.name)
+
+    bus = MessageBus(
+        uow=uow,
+        event_handlers={Started: [make], Made: [record]},
+        command_handlers={},
+        retry_policies={make: RetryPolicy(max_attempts=2, backoff_multiplier=0).build()},
+    )
+    await bus.handle(Started())
+
+    assert await _names(engine) == ["attempt1"]
+    if use_outbox:
+        async with engine.connect() as conn:
+            payloads = (await conn.execute(select(outbox_table.c.payload))).scalars()
+            assert [outbox.load_event(payload) for payload in payloads] == [Made("attempt1")]
+    else:
+        assert dispatched == ["attempt1"]
+
+
+@pytest.mark.asyncio
+async def test_a_nested_unit_of_work_left_uncommitted_drops_its_events(engine):
+    uow = SqlAlchemyUnitOfWork(scoped=True)
+    async with uow.scope():
+        async with uow:
+            kept = _made(uow, "kept")
+            await uow.commit()
+            async with uow:
+                _made(uow, "dropped")
+                kept.events.append(Made("raised in the dropped one"))
+        assert list(uow.collect_new_events()) == [Made("kept")]
+        assert uow.points.seen.of_type(ExampleModel) == [kept]
+
+    assert await _names(engine) == ["kept"]
+
+
+@pytest.mark.asyncio
+async def test_the_session_of_a_unit_of_work_not_entered_in_this_task_is_refused():
+    uow = SqlAlchemyUnitOfWork(session_factory=lambda: FakeSession("session"))
+    with pytest.raises(UnitOfWorkNotEntered):
+        uow.session
+    with pytest.raises(UnitOfWorkNotEntered):
+        uow.points
+
+    assert list(uow.collect_new_events()) == []
+
+    async with uow:
+        assert uow.session.name == "session"